@@ -0,0 +1,263 @@
+import sys
+import json
+import time
+import platform
+import statistics
+import subprocess
+import tempfile
+import multiprocessing
+from pathlib import Path
+from argparse import ArgumentParser
+from contextlib import contextmanager
+from unittest import mock
+from collections.abc import Callable, Iterator, Sequence
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any
+
+from src.jp_dict.dict_query import search, tables
+from src.jp_dict.dict_query.lazy_table import LazyTable
+from src.jp_dict.stats import get_peak_rss
+
+from .synthetic_jmdict import generate_dict_file
+
+SCALES = [10_000, 100_000, 1_000_000]
+QUERIES = {
+    "kana": ["まじょ", "はしる", "こん", "しゃ"],
+    "katakana": ["オールバック", "アイ"],
+    "kanji": ["魔女", "日", "走る", "大学"],
+    "romaji": ["majo", "konban", "hashiru", "gakusei"],
+    "english": ["witch", "run", "water", "evening"],
+    "multi_term": ["magical girl", "good day", "the water of the world"],
+}
+LOAD_COUNTS = [100, 1_000, 10_000]
+TABLES = {
+    "kana": tables.load_kana_table,
+    "kanji": tables.load_kanji_table,
+    "ranks": tables.load_rank_table,
+    "en_terms": tables.load_en_terms_table,
+    "entry_offsets": tables.load_entry_offsets,
+    "entries": tables.load_entries_map,
+    "pos_tags": tables.load_pos_tags,
+}
+
+
+@contextmanager
+def use_data_dir(data_dir: Path) -> Iterator[None]:
+    """index into and search from data_dir instead of the package data"""
+    with mock.patch.multiple(
+        tables,
+        GENERATIONS_DIR=data_dir / "generations",
+        CURRENT_FILE=data_dir / "current",
+        LEGACY_DATA=[],
+    ):
+        search.TERM_CACHE.clear()
+        search.RESULT_CACHE.clear()
+        yield
+    search.TERM_CACHE.clear()
+    search.RESULT_CACHE.clear()
+
+
+def index_in_process(
+    dict_path: Path,
+    data_dir: Path,
+    jobs: int,
+) -> dict[str, Any]:
+    with use_data_dir(data_dir):
+        start = time.perf_counter()
+        tables.update_dictionary(jobs=jobs, dict_path=dict_path)
+        seconds = time.perf_counter() - start
+    # worker processes are counted separately, and only once they exit
+    return {"seconds": seconds, "peak_rss": get_peak_rss()}
+
+
+def bench_index(dict_path: Path, data_dir: Path, jobs: int) -> dict[str, Any]:
+    """index in a fresh process, so that its peak memory is the indexer's"""
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(1, mp_context=context) as executor:
+        future = executor.submit(index_in_process, dict_path, data_dir, jobs)
+        return future.result()
+
+
+def time_call(func: Callable[[], Any], repeat: int) -> list[float]:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def summarize(timings: Sequence[float]) -> dict[str, float]:
+    """summary of timings in milliseconds"""
+    ordered = sorted(timings)
+    return {
+        "min_ms": ordered[0],
+        "median_ms": statistics.median(ordered),
+        "p95_ms": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+        "max_ms": ordered[-1],
+    }
+
+
+def bench_table_loads(repeat: int) -> dict[str, dict[str, float]]:
+    generation = tables.get_generation()
+    return {
+        name: summarize(time_call(
+            lambda: LazyTable(load_func, lambda: generation).contents,
+            repeat,
+        ))
+        for name, load_func in TABLES.items()
+    }
+
+
+def search_cold(query: str, limit: int | None) -> None:
+    """search with empty caches, loading the first page of results"""
+    search.TERM_CACHE.clear()
+    search.RESULT_CACHE.clear()
+    search.search_dictionary(query, limit)[:20]
+
+
+def bench_queries(repeat: int) -> dict[str, dict[str, Any]]:
+    results = {}
+    for category, queries in QUERIES.items():
+        for query in queries:
+            search_cold(query, None)  # load tables
+        result_counts = {
+            query: len(search.search_dictionary(query))
+            for query in queries
+        }
+        results[category] = {
+            "queries": result_counts,
+            "all": summarize([
+                timing
+                for query in queries
+                for timing in time_call(
+                    lambda: search_cold(query, None),
+                    repeat,
+                )
+            ]),
+            "limit_1": summarize([
+                timing
+                for query in queries
+                for timing in time_call(lambda: search_cold(query, 1), repeat)
+            ]),
+        }
+    return results
+
+
+def bench_load_entries(repeat: int) -> dict[str, dict[str, float]]:
+    entry_offsets = search.ENTRY_OFFSETS_TABLE.contents
+    entries_map = search.ENTRIES_TABLE.contents
+    pos_tags = search.POS_TAGS_TABLE.contents
+    entry_count = len(entry_offsets.ids)
+    return {
+        str(count): summarize(time_call(
+            lambda: tables.load_entries(
+                range(min(count, entry_count)),
+                entry_offsets,
+                entries_map,
+                pos_tags,
+            ),
+            repeat,
+        ))
+        for count in LOAD_COUNTS
+    }
+
+
+def bench_scale(
+    entry_count: int,
+    work_dir: Path,
+    jobs: int,
+    repeat: int,
+) -> dict[str, Any]:
+    dict_path = work_dir / f"JMdict_{entry_count}.xml.gz"
+    data_dir = work_dir / f"data_{entry_count}"
+    start = time.perf_counter()
+    generate_dict_file(dict_path, entry_count)
+    print(f"{entry_count} entries: generated", file=sys.stderr)
+    results: dict[str, Any] = {
+        "generate_seconds": time.perf_counter() - start,
+        "dict_file_bytes": dict_path.stat().st_size,
+        "index": bench_index(dict_path, data_dir, jobs),
+    }
+    print(f"{entry_count} entries: indexed", file=sys.stderr)
+    with use_data_dir(data_dir):
+        results["table_loads"] = bench_table_loads(repeat)
+        results["queries"] = bench_queries(repeat)
+        results["load_entries"] = bench_load_entries(repeat)
+    print(f"{entry_count} entries: searched", file=sys.stderr)
+    return results
+
+
+def get_commit() -> str | None:
+    try:
+        output = subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            capture_output=True,
+            check=True,
+            text=True,
+        ).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return output.strip()
+
+
+def main(args: Sequence[str]) -> None:
+    parser = ArgumentParser(
+        description=(
+            "benchmark indexing and searching synthetic dictionaries; "
+            "results are written as JSON"
+        ),
+    )
+    parser.add_argument(
+        "--scales",
+        type=int,
+        nargs="+",
+        default=SCALES,
+        metavar="N",
+        help="numbers of dictionary entries to benchmark",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        metavar="N",
+        help="number of worker processes used to index",
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=5,
+        metavar="N",
+        help="number of times each timing is repeated",
+    )
+    parser.add_argument(
+        "--output",
+        type=Path,
+        help="file to write results to, instead of stdout",
+    )
+    parsed_args = parser.parse_args(args)
+    results: dict[str, Any] = {
+        "commit": get_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "jobs": parsed_args.jobs,
+        "repeat": parsed_args.repeat,
+        "scales": {},
+    }
+    with tempfile.TemporaryDirectory() as work_dir:
+        for entry_count in parsed_args.scales:
+            results["scales"][str(entry_count)] = bench_scale(
+                entry_count,
+                Path(work_dir),
+                parsed_args.jobs,
+                parsed_args.repeat,
+            )
+    output = json.dumps(results, ensure_ascii=False, indent=2)
+    if parsed_args.output is None:
+        print(output)
+    else:
+        parsed_args.output.write_text(output + "\n")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
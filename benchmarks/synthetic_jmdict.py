@@ -0,0 +1,180 @@
+import sys
+import gzip
+import random
+from pathlib import Path
+from typing import TextIO
+from xml.sax.saxutils import escape
+
+PROLOG = """<?xml version="1.0" encoding="UTF-8"?>
+<!DOCTYPE JMdict [
+<!ELEMENT JMdict (entry*)>
+<!ELEMENT entry (ent_seq, k_ele*, r_ele+, sense+)>
+<!ENTITY n "noun (common) (futsuumeishi)">
+<!ENTITY exp "expressions (phrases, clauses, etc.)">
+<!ENTITY int "interjection (kandoushi)">
+<!ENTITY adj-i "adjective (keiyoushi)">
+<!ENTITY v5r "Godan verb with 'ru' ending">
+<!ENTITY n-adv "adverbial noun (fukushitekimeishi)">
+]>
+<JMdict>
+"""
+POS_ENTITIES = ["n", "n", "exp", "adj-i", "v5r", "n-adv"]
+PRIORITIES = ["ichi1", "ichi2", "news1", "news2", "spec1", "gai1"]
+
+# (kanji, kana) pairs; readings are assembled from their syllables
+KANJI_READINGS = [
+    ("日", "にち"), ("月", "げつ"), ("火", "か"), ("水", "すい"),
+    ("木", "き"), ("金", "きん"), ("土", "ど"), ("山", "さん"),
+    ("川", "かわ"), ("人", "じん"), ("口", "くち"), ("手", "て"),
+    ("男", "おとこ"), ("女", "じょ"), ("子", "こ"), ("学", "がく"),
+    ("生", "せい"), ("年", "ねん"), ("大", "だい"), ("小", "しょう"),
+    ("本", "ほん"), ("語", "ご"), ("話", "わ"), ("読", "どく"),
+    ("魔", "ま"), ("法", "ほう"), ("走", "そう"), ("電", "でん"),
+    ("車", "しゃ"), ("会", "かい"), ("社", "しゃ"), ("見", "けん"),
+]
+KANA_SYLLABLES = list(
+    "あいうえおかきくけこさしすせそたちつてとなにぬねのはひふへほ"
+    "まみむめもやゆよらりるれろわんがぎぐげござじずぜぞだでどばびぶべぼ"
+) + ["しょ", "じょ", "きゅ", "ちゃ", "っか", "っと"]
+KATAKANA_SYLLABLES = list(
+    "アイウエオカキクケコサシスセソタチツテトナニヌネノハヒフヘホ"
+    "マミムメモヤユヨラリルレロワンガギグゲゴバビブベボパピプペポ"
+) + ["ー", "ッ", "ティ", "ファ"]
+EN_WORDS = """
+the of to a in is it that he was for on are with as his they be at one have
+this from or had by word but what some we can out other were all there when
+up use your how said an each she which do their time if will way about many
+then them write would like so these her long make thing see him two has look
+more day could go come did number sound no most people my over know water
+than call first who may down side been now find any new work part take get
+place made live where after back little only round man year came show every
+good me give our under name very through just form sentence great think say
+help low line turn cause much mean before move right boy old too same tell
+does set three want air well also play small end put home read hand port large
+spell add even land here must big high such follow act why ask men change went
+light kind off need house picture try us again animal point mother world near
+build self earth father run running witch magic magical girl evening hello
+""".split()
+
+# real entries, so that benchmark queries have sensible matches
+KNOWN_ENTRIES = [
+    (1033740, [], [("オールバック", [])], [(["n"], [
+        "all-back (hair combed straight back without a part)",
+    ])]),
+    (1289400, [("今日は", ["ichi1", "news1"])], [("こんにちは", ["ichi1"])], [
+        (["int", "exp"], ["hello", "good day", "good afternoon"]),
+    ]),
+    (1289470, [("今晩", ["ichi1", "news1"])], [("こんばん", ["ichi1"])], [
+        (["n-adv", "n"], ["this evening", "tonight"]),
+    ]),
+    (1524150, [("魔女", ["ichi1", "news2"])], [("まじょ", ["ichi1"])], [
+        (["n"], ["witch"]),
+    ]),
+    (2209700, [("魔法少女", [])], [("まほうしょうじょ", [])], [
+        (["n"], ["magical girl"]),
+    ]),
+    (1598110, [("走る", ["ichi1", "news1"])], [("はしる", ["ichi1"])], [
+        (["v5r"], ["to run"]),
+    ]),
+]
+
+RANDOM_ENT_SEQ_START = 5000000  # after any real entry
+
+Element = tuple[str, list[str]]  # text and priority tags
+Sense = tuple[list[str], list[str]]  # pos entities and glosses
+
+
+def make_entry_xml(
+    ent_seq: int,
+    kanjis: list[Element],
+    kanas: list[Element],
+    senses: list[Sense],
+) -> str:
+    lines = ["<entry>", f"<ent_seq>{ent_seq}</ent_seq>"]
+    for keb, priorities in kanjis:
+        pri_tags = "".join(f"<ke_pri>{pri}</ke_pri>" for pri in priorities)
+        lines.append(f"<k_ele><keb>{keb}</keb>{pri_tags}</k_ele>")
+    for reb, priorities in kanas:
+        pri_tags = "".join(f"<re_pri>{pri}</re_pri>" for pri in priorities)
+        lines.append(f"<r_ele><reb>{reb}</reb>{pri_tags}</r_ele>")
+    for pos_entities, glosses in senses:
+        pos_tags = "".join(f"<pos>&{pos};</pos>" for pos in pos_entities)
+        gloss_tags = "".join(
+            f"<gloss>{escape(gloss)}</gloss>"
+            for gloss in glosses
+        )
+        lines.append(f"<sense>{pos_tags}{gloss_tags}</sense>")
+    lines.append("</entry>")
+    return "\n".join(lines) + "\n"
+
+
+def make_priorities(rng: random.Random) -> list[str]:
+    roll = rng.random()
+    if roll < 0.7:
+        return []
+    if roll < 0.85:
+        return [f"nf{rng.randint(1, 48):02d}"]
+    return [rng.choice(PRIORITIES)]
+
+
+def make_random_entry(
+    rng: random.Random,
+    ent_seq: int,
+) -> tuple[int, list[Element], list[Element], list[Sense]]:
+    kanjis = []
+    kanas = []
+    if rng.random() < 0.25:
+        # katakana loanword
+        syllables = rng.choices(KATAKANA_SYLLABLES, k=rng.randint(2, 6))
+        kanas.append(("".join(syllables).lstrip("ーッ") or "ア", []))
+    else:
+        pairs = rng.choices(KANJI_READINGS, k=rng.randint(1, 3))
+        priorities = make_priorities(rng)
+        kanjis.append(("".join(kanji for kanji, _ in pairs), priorities))
+        kanas.append(("".join(kana for _, kana in pairs), priorities))
+        if rng.random() < 0.2:
+            syllables = rng.choices(KANA_SYLLABLES, k=rng.randint(1, 4))
+            kanas.append(("".join(syllables), []))
+    senses = [
+        (
+            [rng.choice(POS_ENTITIES)],
+            [
+                " ".join(rng.choices(EN_WORDS, k=rng.randint(1, 4)))
+                for _ in range(rng.randint(1, 3))
+            ],
+        )
+        for _ in range(rng.randint(1, 3))
+    ]
+    return ent_seq, kanjis, kanas, senses
+
+
+def write_synthetic_jmdict(
+    dict_file: TextIO,
+    entry_count: int,
+    seed: int = 0,
+) -> None:
+    """write a JMdict-shaped XML document of entry_count entries, starting
+    with a few real ones; the same seed always gives the same document"""
+    rng = random.Random(seed)
+    dict_file.write(PROLOG)
+    for entry in KNOWN_ENTRIES[:entry_count]:
+        dict_file.write(make_entry_xml(*entry))
+    ent_seq = RANDOM_ENT_SEQ_START
+    for _ in range(entry_count - len(KNOWN_ENTRIES)):
+        ent_seq += rng.randint(1, 5)
+        dict_file.write(make_entry_xml(*make_random_entry(rng, ent_seq)))
+    dict_file.write("</JMdict>\n")
+
+
+def generate_dict_file(path: Path, entry_count: int, seed: int = 0) -> None:
+    """write a synthetic dictionary to path, gzipped if it ends with .gz"""
+    if path.suffix == ".gz":
+        dict_file = gzip.open(path, "wt", encoding="utf-8")
+    else:
+        dict_file = path.open("w", encoding="utf-8")
+    with dict_file:
+        write_synthetic_jmdict(dict_file, entry_count, seed)  # type: ignore
+
+
+if __name__ == "__main__":
+    generate_dict_file(Path(sys.argv[2]), int(sys.argv[1]))
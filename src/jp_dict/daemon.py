@@ -0,0 +1,120 @@
+import os
+import json
+import dataclasses
+import socket
+import getpass
+import tempfile
+import socketserver
+from pathlib import Path
+from typing import Any, Optional
+from collections.abc import Sequence
+
+from .dict_query import search_dictionary
+from .dict_query.entry import Entry
+
+TIMEOUT = 30  # seconds; a cold first query loads every table
+
+
+class DaemonError(Exception):
+    pass
+
+
+def get_socket_path() -> Path:
+    runtime_dir = os.getenv("XDG_RUNTIME_DIR") or tempfile.gettempdir()
+    return Path(runtime_dir) / f"jp-dict-{getpass.getuser()}.sock"
+
+
+def check_socket_owner(socket_path: Path) -> None:
+    """refuse a socket created by another user, who could otherwise read
+    queries and forge results through a shared temporary directory"""
+    if not hasattr(os, "getuid"):  # not available on Windows
+        return
+    if socket_path.stat().st_uid != os.getuid():
+        raise PermissionError(f"{socket_path} is owned by another user")
+
+
+def handle_request(request: dict[str, Any]) -> dict[str, Any]:
+    results = search_dictionary(request["query"], limit=request.get("limit"))
+    return {"entries": [dataclasses.asdict(entry) for entry in results]}
+
+
+class QueryHandler(socketserver.StreamRequestHandler):
+    """answer newline-delimited JSON queries with JSON lists of entries"""
+
+    def handle(self) -> None:
+        for line in self.rfile:
+            try:
+                response = handle_request(json.loads(line))
+            except Exception as error:
+                response = {"error": f"{type(error).__name__}: {error}"}
+            self.wfile.write(
+                json.dumps(response, ensure_ascii=False).encode() + b"\n"
+            )
+
+
+class QueryServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def is_daemon_running(socket_path: Path) -> bool:
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(str(socket_path))
+        except OSError:
+            return False
+    return True
+
+
+def serve(socket_path: Optional[Path] = None) -> None:
+    """serve queries until interrupted, keeping dictionary tables loaded"""
+    socket_path = socket_path or get_socket_path()
+    if socket_path.exists():
+        if is_daemon_running(socket_path):
+            raise DaemonError(f"A daemon is already serving on {socket_path}")
+        socket_path.unlink()  # left over from a daemon that did not exit
+    umask = os.umask(0o177)  # socket accessible to the current user only
+    try:
+        server = QueryServer(str(socket_path), QueryHandler)
+    finally:
+        os.umask(umask)
+    with server:
+        print(f"Serving on {socket_path}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            print()
+        finally:
+            socket_path.unlink(missing_ok=True)
+
+
+def query_daemon(
+    search_str: str,
+    limit: Optional[int] = None,
+    socket_path: Optional[Path] = None,
+) -> list[Entry]:
+    socket_path = socket_path or get_socket_path()
+    check_socket_owner(socket_path)
+    request = {"query": search_str, "limit": limit}
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(TIMEOUT)
+        sock.connect(str(socket_path))
+        sock.sendall(json.dumps(request).encode() + b"\n")
+        with sock.makefile("rb") as sock_file:
+            response = json.loads(sock_file.readline())
+    if "error" in response:
+        raise DaemonError(response["error"])
+    return [Entry(**entry) for entry in response["entries"]]
+
+
+def search_via_daemon(
+    search_str: str,
+    limit: Optional[int] = None,
+) -> Sequence[Entry]:
+    """forward a query to a running daemon, or search in-process if there is
+    no daemon to answer it"""
+    if hasattr(socket, "AF_UNIX"):
+        try:
+            return query_daemon(search_str, limit)
+        except (OSError, ValueError):  # no daemon, or unreadable response
+            pass
+    return search_dictionary(search_str, limit)
@@ -0,0 +1,96 @@
+import asyncio
+import weakref
+import functools
+from typing import Any, Hashable
+from concurrent.futures import Executor
+from collections.abc import Callable, Sequence
+
+from .entry import Entry
+from .lazy_entries import PAGE_SIZE
+from .search import normalize_term, search_dictionary
+
+# executor for searches; None for the event loop's default executor. Search
+# results hold memory maps, so this must run in-process, e.g. a thread pool
+EXECUTOR: Executor | None = None
+
+
+class SharedCall:
+    """a call run in an executor on behalf of several awaiters; the call is
+    cancelled if every awaiter is cancelled before it starts"""
+
+    def __init__(self, future: asyncio.Future) -> None:
+        self.future = future
+        self.waiters = 0
+
+    async def wait(self) -> Any:
+        self.waiters += 1
+        try:
+            return await asyncio.shield(self.future)
+        except asyncio.CancelledError:
+            if self.waiters == 1:
+                self.future.cancel()
+            raise
+        finally:
+            self.waiters -= 1
+
+
+# in-flight calls of each event loop, by key
+_in_flight: weakref.WeakKeyDictionary[
+    asyncio.AbstractEventLoop,
+    dict[Hashable, SharedCall],
+] = weakref.WeakKeyDictionary()
+
+
+async def run_shared(
+    key: Hashable,
+    func: Callable[[], Any],
+    executor: Executor | None = None,
+) -> Any:
+    """run func in executor, sharing the call with concurrent awaiters of the
+    same key"""
+    loop = asyncio.get_running_loop()
+    calls = _in_flight.setdefault(loop, {})
+    call = calls.get(key)
+    if call is None:
+        future = loop.run_in_executor(executor, func)
+        call = calls[key] = SharedCall(future)
+        future.add_done_callback(lambda _: calls.pop(key, None))
+    return await call.wait()
+
+
+def search_first_page(
+    search_str: str,
+    limit: int | None,
+    page_size: int,
+) -> Sequence[Entry]:
+    """search and load the first page of results, so that reading it does not
+    block the event loop"""
+    results = search_dictionary(search_str, limit)
+    results[:page_size]
+    return results
+
+
+async def search_dictionary_async(
+    search_str: str,
+    limit: int | None = None,
+    executor: Executor | None = None,
+) -> Sequence[Entry]:
+    """search_dictionary run in an executor (EXECUTOR by default), with the
+    first page of results loaded; concurrent searches for the same query share
+    a single search. Later pages are best read with load_entries_async."""
+    query = " ".join(normalize_term(term) for term in search_str.split())
+    return await run_shared(
+        ("search", query, limit),
+        functools.partial(search_first_page, query, limit, PAGE_SIZE),
+        executor or EXECUTOR,
+    )
+
+
+async def load_entries_async(
+    results: Sequence[Entry],
+    start: int = 0,
+    stop: int | None = None,
+) -> list[Entry]:
+    """load a range of search results in a thread, since loading reads the
+    entries file"""
+    return await asyncio.to_thread(lambda: list(results[start:stop]))
@@ -1,10 +1,170 @@
-PUNCTUATION = ".,;:!?()[]{}<>"
+import functools
 
+PUNCTUATION = ".,;:!?()[]{}<>'\""
+MIN_TERM_LENGTH = 3  # letters; shorter words such as "to" are not indexed
+STEM_CACHE_SIZE = 1 << 16  # distinct words; glosses reuse a small vocabulary
+VOWELS = "aeiou"
 
-# TODO: proper word stemming
+# Porter stemmer suffix rules, as (suffix, replacement); the longest matching
+# suffix of each step is the only one tried
+STEP_2_RULES = [
+    ("ational", "ate"),
+    ("tional", "tion"),
+    ("enci", "ence"),
+    ("anci", "ance"),
+    ("izer", "ize"),
+    ("bli", "ble"),
+    ("alli", "al"),
+    ("entli", "ent"),
+    ("eli", "e"),
+    ("ousli", "ous"),
+    ("ization", "ize"),
+    ("ation", "ate"),
+    ("ator", "ate"),
+    ("alism", "al"),
+    ("iveness", "ive"),
+    ("fulness", "ful"),
+    ("ousness", "ous"),
+    ("aliti", "al"),
+    ("iviti", "ive"),
+    ("biliti", "ble"),
+    ("logi", "log"),
+]
+STEP_3_RULES = [
+    ("icate", "ic"),
+    ("ative", ""),
+    ("alize", "al"),
+    ("iciti", "ic"),
+    ("ical", "ic"),
+    ("ful", ""),
+    ("ness", ""),
+]
+STEP_4_SUFFIXES = [
+    "al", "ance", "ence", "er", "ic", "able", "ible", "ant", "ement", "ment",
+    "ent", "ion", "ou", "ism", "ate", "iti", "ous", "ive", "ize",
+]
+
+
+def is_consonant(word: str, i: int) -> bool:
+    if word[i] in VOWELS:
+        return False
+    if word[i] == "y":
+        return i == 0 or not is_consonant(word, i - 1)
+    return True
+
+
+def measure(stem: str) -> int:
+    """number of vowel-consonant sequences in stem"""
+    count = 0
+    prev_is_vowel = False
+    for i in range(len(stem)):
+        is_vowel = not is_consonant(stem, i)
+        if prev_is_vowel and not is_vowel:
+            count += 1
+        prev_is_vowel = is_vowel
+    return count
+
+
+def has_vowel(stem: str) -> bool:
+    return any(not is_consonant(stem, i) for i in range(len(stem)))
+
+
+def ends_double_consonant(word: str) -> bool:
+    return (
+        len(word) >= 2
+        and word[-1] == word[-2]
+        and is_consonant(word, len(word) - 1)
+    )
+
+
+def ends_cvc(word: str) -> bool:
+    """word ends consonant-vowel-consonant, the last not w, x or y"""
+    return (
+        len(word) >= 3
+        and is_consonant(word, len(word) - 3)
+        and not is_consonant(word, len(word) - 2)
+        and is_consonant(word, len(word) - 1)
+        and word[-1] not in "wxy"
+    )
+
+
+def replace_suffix(
+    word: str,
+    rules: list[tuple[str, str]],
+    min_measure: int,
+) -> str:
+    for suffix, replacement in sorted(rules, key=lambda rule: -len(rule[0])):
+        if word.endswith(suffix):
+            stem = word[:-len(suffix)]
+            if measure(stem) > min_measure:
+                return stem + replacement
+            return word
+    return word
+
+
+def stem_plural_and_participle(word: str) -> str:
+    """Porter stemmer steps 1a-1c"""
+    if word.endswith("sses") or word.endswith("ies"):
+        word = word[:-2]
+    elif word.endswith("s") and not word.endswith("ss"):
+        word = word[:-1]
+    if word.endswith("eed"):
+        if measure(word[:-3]) > 0:
+            word = word[:-1]
+    else:
+        for suffix in ["ed", "ing"]:
+            if word.endswith(suffix) and has_vowel(word[:-len(suffix)]):
+                word = word[:-len(suffix)]
+                if word.endswith(("at", "bl", "iz")):
+                    word += "e"
+                elif ends_double_consonant(word) and word[-1] not in "lsz":
+                    word = word[:-1]
+                elif measure(word) == 1 and ends_cvc(word):
+                    word += "e"
+                break
+    if word.endswith("y") and has_vowel(word[:-1]):
+        word = word[:-1] + "i"
+    return word
+
+
+def stem_suffixes(word: str) -> str:
+    """Porter stemmer steps 2-5"""
+    word = replace_suffix(word, STEP_2_RULES, 0)
+    word = replace_suffix(word, STEP_3_RULES, 0)
+    for suffix in sorted(STEP_4_SUFFIXES, key=len, reverse=True):
+        if word.endswith(suffix):
+            stem = word[:-len(suffix)]
+            if measure(stem) > 1 and (suffix != "ion" or stem[-1:] in "st"):
+                word = stem
+            break
+    if word.endswith("e"):
+        stem = word[:-1]
+        if measure(stem) > 1 or (measure(stem) == 1 and not ends_cvc(stem)):
+            word = stem
+    if measure(word) > 1 and ends_double_consonant(word) and word[-1] == "l":
+        word = word[:-1]
+    return word
+
+
+def normalize_word(word: str) -> str:
+    """lowercase word without surrounding punctuation or a possessive 's"""
+    return word.lower().strip(PUNCTUATION).removesuffix("'s")
+
+
+def is_en_term(word: str) -> bool:
+    """whether a normalized word is long enough to index; decided before
+    stemming, since a stem may be shorter than its word, e.g. eye -> ey"""
+    return len(word) >= MIN_TERM_LENGTH
+
+
+@functools.lru_cache(maxsize=STEM_CACHE_SIZE)
 def stem_word(word: str) -> str:
-    """reduce a word to a normalized stem; e.g. running -> run"""
-    return word.lower().strip(PUNCTUATION)
+    """reduce a word to a normalized stem with the Porter stemmer; e.g.
+    running -> run"""
+    word = normalize_word(word)
+    if not is_en_term(word):
+        return word
+    return stem_suffixes(stem_plural_and_participle(word))
 
 
 def make_en_terms(sentence: str) -> list[str]:
@@ -15,9 +175,19 @@ def make_en_terms(sentence: str) -> list[str]:
     #     if len(stem) > 2:
     #         stems.append(stem)
     # return stems
+    return [stem for stem in make_en_phrase(sentence) if stem]
+
+
+def make_en_words(sentence: str) -> list[str]:
+    """split a sentence into normalized words"""
+    return [word for word in map(normalize_word, sentence.split()) if word]
+
+
+def make_en_phrase(sentence: str) -> list[str]:
+    """split a sentence into normalized word stems, with an empty string in
+    place of each word too short to be a term, so that the positions of the
+    stems are those of their words"""
     return [
-        stem
-        for word in sentence.split()
-        if (stem := stem_word(word))
-        and len(stem) > 2
+        stem_word(word) if is_en_term(word) else ""
+        for word in make_en_words(sentence)
     ]
@@ -0,0 +1,261 @@
+import math
+import heapq
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from dataclasses import dataclass
+from collections.abc import Mapping, Sequence
+
+from .entry import UNRANKED
+from .packed import Section, StringPool, pack_groups, pack_strings
+
+# BM25 term frequency saturation and length normalization
+BM25_K1 = 1.2
+BM25_B = 0.75
+# score added for an entry's JMdict priority, from PRIORITY_WEIGHT for the
+# highest priority down to 0 for unranked entries
+PRIORITY_WEIGHT = 2.0
+
+
+@dataclass(frozen=True)
+class EnIndex:
+    """English term -> postings of (entry ordinal, first term position, entry
+    term count); postings are presorted by entry rank, then by relative
+    position of the term in the entry. Each posting also lists every phrase
+    position of the term in the entry, where positions count every word,
+    including words too short to be terms, and skip one at each gloss
+    boundary, so that phrases never span glosses.
+
+    For relevance ranking, each term's postings are also stored sorted by
+    ordinal, with BM25 scores precomputed from the term's document frequency
+    and the entry's length, along with the maximum score of each term and the
+    priority score of each entry"""
+    terms: StringPool  # sorted
+    posting_offsets: Sequence[int]
+    posting_ordinals: Sequence[int]
+    posting_positions: Sequence[int]
+    posting_term_counts: Sequence[int]
+    phrase_position_offsets: Sequence[int]
+    phrase_positions: Sequence[int]
+    score_ordinals: Sequence[int]  # same offsets as the postings
+    scores: Sequence[float]
+    term_max_scores: Sequence[float]
+    entry_priorities: Sequence[float]
+
+    @classmethod
+    def from_sections(cls, sections: Mapping[str, memoryview]) -> "EnIndex":
+        return cls(
+            terms=StringPool(sections["term_offsets"], sections["terms"]),
+            posting_offsets=sections["posting_offsets"],
+            posting_ordinals=sections["posting_ordinals"],
+            posting_positions=sections["posting_positions"],
+            posting_term_counts=sections["posting_term_counts"],
+            phrase_position_offsets=sections["phrase_position_offsets"],
+            phrase_positions=sections["phrase_positions"],
+            score_ordinals=sections["score_ordinals"],
+            scores=sections["scores"],
+            term_max_scores=sections["term_max_scores"],
+            entry_priorities=sections["entry_priorities"],
+        )
+
+    def get_postings(self, term: str) -> range:
+        """positions of the postings of term within the posting arrays"""
+        i = self.terms.index_of(term)
+        if i < 0:
+            return range(0)
+        return range(self.posting_offsets[i], self.posting_offsets[i + 1])
+
+    def get_max_score(self, term: str) -> float:
+        i = self.terms.index_of(term)
+        return 0.0 if i < 0 else self.term_max_scores[i]
+
+    def get_phrase_positions(self, posting: int) -> Sequence[int]:
+        """sorted phrase positions of a posting's term in its entry"""
+        return self.phrase_positions[
+            self.phrase_position_offsets[posting]:
+            self.phrase_position_offsets[posting + 1]
+        ]
+
+
+def pack_en_index(
+    en_terms_table: Sequence[list[list[str]]],
+    ranks: Sequence[int],
+) -> dict[str, Section]:
+    """index terms from a table of entry ordinal -> glosses -> terms, where
+    empty terms stand for words too short to index"""
+    postings: dict[str, list[tuple[int, int, int, list[int]]]] = {}
+    for ordinal, glosses in enumerate(en_terms_table):
+        term_count = sum(1 for terms in glosses for term in terms if term)
+        first_positions: dict[str, int] = {}
+        word_positions: dict[str, list[int]] = {}
+        position = 0  # among the entry's terms
+        word_position = 0
+        for terms in glosses:
+            for term in terms:
+                if term:
+                    first_positions.setdefault(term, position)
+                    word_positions.setdefault(term, []).append(word_position)
+                    position += 1
+                word_position += 1
+            word_position += 1  # gloss boundary
+        for term, position in first_positions.items():
+            posting = (ordinal, position, term_count, word_positions[term])
+            postings.setdefault(term, []).append(posting)
+    scored_postings = score_postings(postings, len(en_terms_table))
+    for term_postings in postings.values():
+        term_postings.sort(key=lambda posting: (
+            ranks[posting[0]],
+            posting[1] / posting[2],
+        ))
+    terms = sorted(postings.keys())
+    term_offsets, term_data = pack_strings(terms)
+    posting_offsets = array("I", [0])
+    posting_ordinals = array("i")
+    posting_positions = array("i")
+    posting_term_counts = array("i")
+    for term in terms:
+        for ordinal, position, term_count, _ in postings[term]:
+            posting_ordinals.append(ordinal)
+            posting_positions.append(position)
+            posting_term_counts.append(term_count)
+        posting_offsets.append(len(posting_ordinals))
+    phrase_position_offsets, phrase_positions = pack_groups(
+        posting[3]
+        for term in terms
+        for posting in postings[term]
+    )
+    score_ordinals = array("i")
+    scores = array("f")
+    for term in terms:
+        for ordinal, score in scored_postings[term]:
+            score_ordinals.append(ordinal)
+            scores.append(score)
+    return {
+        "term_offsets": term_offsets,
+        "terms": term_data,
+        "posting_offsets": posting_offsets,
+        "posting_ordinals": posting_ordinals,
+        "posting_positions": posting_positions,
+        "posting_term_counts": posting_term_counts,
+        "phrase_position_offsets": phrase_position_offsets,
+        "phrase_positions": phrase_positions,
+        "score_ordinals": score_ordinals,
+        "scores": scores,
+        "term_max_scores": array("f", [
+            max(score for _, score in scored_postings[term])
+            for term in terms
+        ]),
+        "entry_priorities": array("f", map(get_priority, ranks)),
+    }
+
+
+def get_priority(rank: int) -> float:
+    return PRIORITY_WEIGHT * (UNRANKED - min(rank, UNRANKED)) / UNRANKED
+
+
+def score_postings(
+    postings: Mapping[str, list[tuple[int, int, int, list[int]]]],
+    entry_count: int,
+) -> dict[str, list[tuple[int, float]]]:
+    """BM25 score of each posting, by term; postings are in ordinal order"""
+    term_counts = {
+        ordinal: term_count
+        for term_postings in postings.values()
+        for ordinal, _, term_count, _ in term_postings
+    }
+    average_term_count = sum(term_counts.values()) / max(len(term_counts), 1)
+    scored_postings = {}
+    for term, term_postings in postings.items():
+        document_count = len(term_postings)
+        idf = math.log(
+            1 + (entry_count - document_count + 0.5) / (document_count + 0.5)
+        )
+        scored_postings[term] = [
+            (ordinal, idf * len(positions) * (BM25_K1 + 1) / (
+                len(positions)
+                + BM25_K1 * (
+                    1 - BM25_B + BM25_B * term_count / average_term_count
+                )
+            ))
+            for ordinal, _, term_count, positions in term_postings
+        ]
+    return scored_postings
+
+
+def add_scores(
+    index: EnIndex,
+    term: str,
+    weight: int,
+    scores: dict[int, float],
+    new_entries: bool,
+) -> None:
+    """add weight times the scores of term to the scores of matching entries,
+    starting from their priority score; with new_entries false, only to
+    entries already scored"""
+    postings = index.get_postings(term)
+    if new_entries:
+        for posting in postings:
+            ordinal = index.score_ordinals[posting]
+            score = scores.get(ordinal)
+            if score is None:
+                score = index.entry_priorities[ordinal]
+            scores[ordinal] = score + weight * index.scores[posting]
+    elif len(scores) * max(len(postings), 1).bit_length() < len(postings):
+        # few entries; look each up in the postings, which are by ordinal
+        lo = postings.start
+        for ordinal in sorted(scores.keys()):
+            lo = bisect_left(index.score_ordinals, ordinal, lo, postings.stop)
+            if lo == postings.stop:
+                break
+            if index.score_ordinals[lo] == ordinal:
+                scores[ordinal] += weight * index.scores[lo]
+    else:
+        for posting in postings:
+            ordinal = index.score_ordinals[posting]
+            if ordinal in scores:
+                scores[ordinal] += weight * index.scores[posting]
+
+
+def rank_entries(
+    index: EnIndex,
+    terms: Sequence[str],
+    limit: int | None = None,
+) -> list[int]:
+    """ordinals of entries matching any of terms, by BM25 score plus priority
+    score, then by ordinal; repeated terms count once per occurrence.
+
+    With a limit, terms are scored from the highest max score down, MaxScore
+    style: once the top `limit` entries so far score above any entry matching
+    only the remaining terms, those terms only add to entries already scored,
+    and entries that can no longer reach the top are dropped"""
+    term_weights = Counter(terms)
+    ordered_terms = sorted(
+        term_weights.keys(),
+        key=lambda term: -term_weights[term] * index.get_max_score(term),
+    )
+    remaining_max_score = sum(
+        weight * index.get_max_score(term)
+        for term, weight in term_weights.items()
+    )
+    scores: dict[int, float] = {}
+    new_entries = True
+    for term in ordered_terms:
+        weight = term_weights[term]
+        add_scores(index, term, weight, scores, new_entries)
+        remaining_max_score -= weight * index.get_max_score(term)
+        if not limit or len(scores) < limit:
+            continue
+        # the top scores so far are lower bounds of the final top scores
+        threshold = heapq.nlargest(limit, scores.values())[-1]
+        if threshold > PRIORITY_WEIGHT + remaining_max_score:
+            new_entries = False
+            scores = {
+                ordinal: score
+                for ordinal, score in scores.items()
+                if score + remaining_max_score >= threshold
+            }
+    ordinals = sorted(
+        scores.keys(),
+        key=lambda ordinal: (-scores[ordinal], ordinal),
+    )
+    return ordinals if limit is None else ordinals[:limit]
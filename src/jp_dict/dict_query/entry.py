@@ -1,7 +1,41 @@
+from itertools import islice
 from dataclasses import dataclass
+from typing import Any
 
+UNRANKED = 50  # rank of entries without priority tags; also the max rank
+POS_SEPARATOR = ", "  # between the part-of-speech tags of a sense
 
-@dataclass
+# part-of-speech tag ids of a sense in an entry record; tags the dictionary
+# does not define are stored as strings
+TagIds = list[int | str]
+
+
+class PosTags:
+    """part-of-speech tags defined by the dictionary, which entry records
+    refer to by index; the joined tags of each distinct sense are shared by
+    all entries loaded with them"""
+
+    def __init__(self, tags: list[str]) -> None:
+        self.tags = tags
+        self.ids = {tag: i for i, tag in enumerate(tags)}
+        self._joined: dict[tuple[int | str, ...], str] = {}
+
+    def encode(self, tags: list[str]) -> TagIds:
+        return [self.ids.get(tag, tag) for tag in tags]
+
+    def decode(self, tag_ids: TagIds) -> str:
+        key = tuple(tag_ids)
+        try:
+            return self._joined[key]
+        except KeyError:
+            joined = POS_SEPARATOR.join(
+                tag_id if isinstance(tag_id, str) else self.tags[tag_id]
+                for tag_id in tag_ids
+            )
+            return self._joined.setdefault(key, joined)
+
+
+@dataclass(slots=True)
 class Entry:
     id: int
     rank: int
@@ -9,6 +43,20 @@ class Entry:
     kanas: list[str]
     meanings: list[tuple[str, str]]
 
+    @classmethod
+    def from_record(cls, record: dict[str, Any], pos_tags: PosTags) -> "Entry":
+        """entry from a decoded JSON entry record"""
+        return cls(
+            record["id"],
+            record["rank"],
+            record["kanjis"],
+            record["kanas"],
+            [
+                (pos_tags.decode(tag_ids), gloss)
+                for tag_ids, gloss in record["meanings"]
+            ],
+        )
+
     @property
     def kanji(self) -> str:
         """first kanji"""
@@ -24,14 +72,13 @@ class Entry:
         return self.kanas[0]
 
     @property
-    def alt_forms(self) -> list[str]:
-        """subsequent kanji and first kana"""
-        alt_forms = self.kanjis[1:]
-        try:
-            alt_forms.insert(1, self.kanas[1])
-        except IndexError:
-            pass
-        return alt_forms
+    def alt_forms(self) -> tuple[str, ...]:
+        """second kanji, then second kana, then subsequent kanji"""
+        return (
+            *islice(self.kanjis, 1, 2),
+            *islice(self.kanas, 1, 2),
+            *islice(self.kanjis, 2, None),
+        )
 
     def __hash__(self) -> int:
         return hash(self.id)
@@ -0,0 +1,58 @@
+from typing import overload
+from collections.abc import Callable, Iterator, Sequence
+
+from .entry import Entry
+
+PAGE_SIZE = 20
+
+LoadFunc = Callable[[Sequence[int]], list[Entry]]
+
+
+class LazyEntries(Sequence[Entry]):
+    """search results that load entries on demand, one page at a time"""
+
+    def __init__(
+        self,
+        ordinals: Sequence[int],
+        load_func: LoadFunc,
+        page_size: int = PAGE_SIZE,
+    ) -> None:
+        self.ordinals = ordinals
+        self._load_func = load_func
+        self._page_size = page_size
+        self._pages: dict[int, list[Entry]] = {}
+
+    def __len__(self) -> int:
+        return len(self.ordinals)
+
+    @overload
+    def __getitem__(self, i: int) -> Entry:
+        ...
+
+    @overload
+    def __getitem__(self, i: slice) -> list[Entry]:
+        ...
+
+    def __getitem__(self, i: int | slice) -> Entry | list[Entry]:
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("result index out of range")
+        page_num, page_idx = divmod(i, self._page_size)
+        return self._get_page(page_num)[page_idx]
+
+    def __iter__(self) -> Iterator[Entry]:
+        for page_num in range(-(-len(self) // self._page_size)):
+            yield from self._get_page(page_num)
+
+    def _get_page(self, page_num: int) -> list[Entry]:
+        try:
+            return self._pages[page_num]
+        except KeyError:
+            pass
+        start = page_num * self._page_size
+        page = self._load_func(self.ordinals[start:start + self._page_size])
+        self._pages[page_num] = page
+        return page
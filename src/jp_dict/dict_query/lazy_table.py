@@ -1,54 +1,130 @@
+import time
+import weakref
 import threading
 from typing import Any
 from collections.abc import Callable
 
+from ..stats import count, get_mapped_size, span
+
 TIMEOUT = 30 * 60  # 30 mins
+REAP_INTERVAL = 60  # seconds between checks for idle tables
+MEMORY_BUDGET: int | None = None  # bytes of loaded tables; None for no limit
+
+LoadFunc = Callable[..., Any]
+VersionFunc = Callable[[], Any]
+
+
+class Reaper:
+    """a single daemon thread that unloads tables idle for longer than
+    TIMEOUT, and least recently used tables while loaded tables exceed
+    MEMORY_BUDGET"""
 
-LoadFunc = Callable[[], dict[int, Any]]
+    def __init__(self) -> None:
+        self._tables: weakref.WeakSet[LazyTable] = weakref.WeakSet()
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
 
+    def track(self, table: "LazyTable") -> None:
+        """reap a newly loaded table, enforcing the memory budget at once"""
+        with self._lock:
+            self._tables.add(table)
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run,
+                    name="LazyTable reaper",
+                    daemon=True,
+                )
+                self._thread.start()
+        self.enforce_budget()
 
-class Timer:
-    """wrapper class for threading.Timer"""
+    def _run(self) -> None:
+        while True:
+            time.sleep(min(REAP_INTERVAL, TIMEOUT))
+            self.reap()
 
-    def __init__(self, timeout: int | float, callback: Callable) -> None:
-        self.callback = callback
-        self.timeout = timeout
+    def reap(self, now: float | None = None) -> None:
+        if now is None:
+            now = time.monotonic()
+        for table in list(self._tables):
+            table.unload(idle_since=now - TIMEOUT)
+        self.enforce_budget()
 
-    def start(self) -> None:
-        self.cancel()
-        self._timer = threading.Timer(self.timeout, self._stop)
-        self._timer.daemon = True
-        self._timer.start()
+    def enforce_budget(self) -> None:
+        if MEMORY_BUDGET is None:
+            return
+        loaded = sorted(
+            (table for table in list(self._tables) if table.nbytes),
+            key=lambda table: table.last_access,
+        )
+        total = sum(table.nbytes for table in loaded)
+        for table in loaded:
+            if total <= MEMORY_BUDGET:
+                break
+            nbytes = table.nbytes
+            if table.unload(idle_since=table.last_access):
+                total -= nbytes
 
-    def cancel(self) -> None:
-        try:
-            self._timer.cancel()
-            del self._timer
-        except AttributeError:
-            pass
 
-    def _stop(self) -> None:
-        self.cancel()
-        self.callback()
+REAPER = Reaper()
 
 
 class LazyTable:
-    """lazy-load tables and automatically unload them when not in use"""
+    """lazy-load tables and automatically unload them when not in use; with a
+    version function, the table is loaded for the version it returns, and
+    reloaded on access once the version changes. Concurrent first accesses
+    share a single load."""
 
-    def __init__(self, load_func: LoadFunc) -> None:
+    def __init__(
+        self,
+        load_func: LoadFunc,
+        version_func: VersionFunc | None = None,
+        name: str = "table",
+    ) -> None:
+        self.name = name
+        self.last_access = 0.0
+        self.nbytes = 0  # mapped size of the loaded contents
         self._load_func = load_func
-        self._timer = Timer(TIMEOUT, self._unload)
+        self._version_func = version_func
+        self._loaded: tuple[Any, Any] | None = None  # (version, contents)
+        self._lock = threading.Lock()
 
     @property
-    def contents(self) -> dict[int, Any]:
-        self._timer.cancel()  # manually cancel to avoid race condition
-        if not hasattr(self, "_contents"):
-            self._contents = self._load_func()
-        self._timer.start()
-        return self._contents
-
-    def _unload(self) -> None:
-        try:
-            del self._contents
-        except AttributeError:
-            pass
+    def contents(self) -> Any:
+        self.last_access = time.monotonic()
+        version = self._version_func() if self._version_func else None
+        loaded = self._loaded
+        if loaded is not None and loaded[0] == version:
+            return loaded[1]
+        with self._lock:
+            loaded = self._loaded
+            if loaded is not None and loaded[0] == version:
+                return loaded[1]  # loaded by another thread meanwhile
+            with span(f"load {self.name}"):
+                if self._version_func is None:
+                    contents = self._load_func()
+                else:
+                    contents = self._load_func(version)
+            self._loaded = (version, contents)
+            self.nbytes = get_mapped_size(contents)
+        count(f"{self.name} loads")
+        REAPER.track(self)
+        return contents
+
+    @property
+    def loaded_contents(self) -> Any:
+        """contents if loaded, without loading them"""
+        loaded = self._loaded
+        return None if loaded is None else loaded[1]
+
+    def unload(self, idle_since: float | None = None) -> bool:
+        """unload contents, if not accessed after idle_since; return whether
+        contents were unloaded"""
+        with self._lock:
+            if self._loaded is None:
+                return False
+            if idle_since is not None and self.last_access > idle_since:
+                return False
+            self._loaded = None
+            self.nbytes = 0
+        count(f"{self.name} unloads")
+        return True
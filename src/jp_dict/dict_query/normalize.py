@@ -0,0 +1,34 @@
+import unicodedata
+
+KATAKANA_TO_HIRAGANA = {
+    code: code - 0x60
+    for code in range(ord("ァ"), ord("ヶ") + 1)
+}
+LONG_VOWEL_MARK = "ー"
+# vowel of each hiragana, for spelling out long vowel marks
+KANA_VOWELS = {
+    kana: vowel
+    for vowel, kanas in [
+        ("あ", "あかさたなはまやらわがざだばぱぁゃゎ"),
+        ("い", "いきしちにひみりゐぎじぢびぴぃ"),
+        ("う", "うくすつぬふむゆるぐずづぶぷぅゅゔ"),
+        ("え", "えけせてねへめれゑげぜでべぺぇ"),
+        ("お", "おこそとのほもよろをごぞどぼぽぉょ"),
+    ]
+    for kana in kanas
+}
+
+
+def normalize_reading(reading: str) -> str:
+    """fold a reading to the key it is indexed and searched by: NFKC
+    normalized (folding character widths) and lowercased, katakana as
+    hiragana, and long vowel marks spelled out as the vowel they lengthen"""
+    reading = unicodedata.normalize("NFKC", reading).lower()
+    reading = reading.translate(KATAKANA_TO_HIRAGANA)
+    if LONG_VOWEL_MARK not in reading:
+        return reading
+    chars = list(reading)
+    for i in range(1, len(chars)):
+        if chars[i] == LONG_VOWEL_MARK:
+            chars[i] = KANA_VOWELS.get(chars[i - 1], LONG_VOWEL_MARK)
+    return "".join(chars)
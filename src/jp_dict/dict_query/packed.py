@@ -0,0 +1,133 @@
+import os
+import json
+import mmap
+import struct
+from array import array
+from bisect import bisect_left
+from typing import overload
+from importlib import resources
+from importlib.abc import Traversable
+from collections.abc import Iterable, Mapping, Sequence
+
+# packed file layout: magic, version and header length, a JSON header mapping
+# section names to (typecode, offset, nbytes), then the sections themselves,
+# each aligned to 8 bytes; strings are stored as pools of utf-8 data + offsets
+MAGIC = b"JPDT"
+VERSION = 1
+HEADER_PREFIX = struct.Struct("<4sII")  # magic, version, header length
+ALIGNMENT = 8
+BYTES_TYPECODE = "B"
+
+Section = array | bytes
+
+
+class PackedError(ValueError):
+    pass
+
+
+class StringPool(Sequence[str]):
+    """read-only sequence of strings backed by utf-8 data and offsets"""
+
+    def __init__(
+        self,
+        offsets: Sequence[int],
+        data: memoryview | bytes,
+    ) -> None:
+        self._offsets = offsets
+        self._data = data
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    @overload
+    def __getitem__(self, i: int) -> str:
+        ...
+
+    @overload
+    def __getitem__(self, i: slice) -> list[str]:
+        ...
+
+    def __getitem__(self, i: int | slice) -> str | list[str]:
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError("string pool index out of range")
+        start = self._offsets[i]
+        end = self._offsets[i + 1]
+        return str(self._data[start:end], "utf-8")
+
+    def index_of(self, value: str) -> int:
+        """index of value in a sorted pool, -1 if absent"""
+        i = bisect_left(self, value)
+        if i < len(self) and self[i] == value:
+            return i
+        return -1
+
+
+def pack_strings(strings: Iterable[str]) -> tuple[array, bytes]:
+    offsets = array("I", [0])
+    data = bytearray()
+    for string in strings:
+        data += string.encode()
+        offsets.append(len(data))
+    return offsets, bytes(data)
+
+
+def pack_groups(groups: Iterable[Sequence[int]]) -> tuple[array, array]:
+    """flatten groups of ints to (offsets, values); group i is
+    values[offsets[i]:offsets[i + 1]]"""
+    offsets = array("I", [0])
+    values = array("i")
+    for group in groups:
+        values.extend(group)
+        offsets.append(len(values))
+    return offsets, values
+
+
+def write_packed(sections: Mapping[str, Section], trav: Traversable) -> None:
+    header = {}
+    offset = 0
+    for name, section in sections.items():
+        typecode = (
+            section.typecode
+            if isinstance(section, array)
+            else BYTES_TYPECODE
+        )
+        nbytes = memoryview(section).nbytes
+        header[name] = [typecode, offset, nbytes]
+        offset += -(-nbytes // ALIGNMENT) * ALIGNMENT
+    header_bytes = json.dumps(header).encode()
+    header_len = HEADER_PREFIX.size + len(header_bytes)
+    header_bytes += b" " * (-header_len % ALIGNMENT)
+    with resources.as_file(trav) as path:
+        if not path.parent.exists():
+            path.parent.mkdir(parents=True)
+        # replace rather than overwrite, so existing maps stay readable
+        tmp_path = path.with_name(path.name + ".tmp")
+        with tmp_path.open("wb") as file:
+            file.write(HEADER_PREFIX.pack(MAGIC, VERSION, len(header_bytes)))
+            file.write(header_bytes)
+            for section in sections.values():
+                nbytes = file.write(section)
+                file.write(b"\0" * (-nbytes % ALIGNMENT))
+        os.replace(tmp_path, path)
+
+
+def load_packed(trav: Traversable) -> dict[str, memoryview]:
+    """memory-map a packed file; sections are zero-copy views into the map,
+    which is closed once the last view is released"""
+    with trav.open("rb") as file:
+        mapped = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    view = memoryview(mapped)
+    magic, version, header_len = HEADER_PREFIX.unpack_from(view)
+    if magic != MAGIC or version != VERSION:
+        raise PackedError(f"{trav} is not a version {VERSION} packed table")
+    start = HEADER_PREFIX.size + header_len
+    header = json.loads(bytes(view[HEADER_PREFIX.size:start]))
+    sections = {}
+    for name, (typecode, offset, nbytes) in header.items():
+        section = view[start + offset:start + offset + nbytes]
+        sections[name] = section.cast(typecode)
+    return sections
@@ -0,0 +1,52 @@
+import threading
+from typing import Any, Generic, Hashable, TypeVar
+from collections import OrderedDict
+
+T = TypeVar("T")
+
+_MISSING = object()
+
+
+class QueryCache(Generic[T]):
+    """bounded LRU cache of query results, tied to a version of the data files;
+    a cache validated against a different version is cleared"""
+
+    def __init__(self, maxsize: int) -> None:
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._version: Any = None
+        self._items: OrderedDict[Hashable, T] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def get(self, key: Hashable) -> T | None:
+        with self._lock:
+            value = self._items.get(key, _MISSING)
+            if value is _MISSING:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return value  # type: ignore[return-value]
+
+    def put(self, key: Hashable, value: T) -> None:
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > max(self.maxsize, 0):
+                self._items.popitem(last=False)
+
+    def validate(self, version: Any) -> None:
+        with self._lock:
+            if version != self._version:
+                self._items.clear()
+                self._version = version
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+            self.hits = 0
+            self.misses = 0
@@ -0,0 +1,159 @@
+from array import array
+from bisect import bisect_left
+from dataclasses import dataclass
+from collections.abc import Iterator, Mapping, Sequence
+
+from .packed import Section, StringPool, pack_groups, pack_strings
+
+MAX_CHAR = chr(0x10FFFF)  # sorts after any character of a reading
+
+
+@dataclass(frozen=True)
+class ReadingIndex:
+    """kana or kanji readings flattened into rows in table order, with a
+    sorted view for exact/prefix lookups and n-gram postings for substrings"""
+    ordinals: Sequence[int]  # entry ordinal of each row
+    readings: StringPool  # reading of each row
+    sorted_rows: Sequence[int]  # rows ordered by reading
+    ngrams: StringPool  # sorted uni- and bigrams
+    ngram_offsets: Sequence[int]
+    ngram_rows: Sequence[int]  # ascending rows of each ngram, concatenated
+
+    @classmethod
+    def from_sections(
+        cls,
+        sections: Mapping[str, memoryview],
+    ) -> "ReadingIndex":
+        return cls(
+            ordinals=sections["ordinals"],
+            readings=StringPool(
+                sections["reading_offsets"],
+                sections["readings"],
+            ),
+            sorted_rows=sections["sorted_rows"],
+            ngrams=StringPool(sections["ngram_offsets"], sections["ngrams"]),
+            ngram_offsets=sections["ngram_row_offsets"],
+            ngram_rows=sections["ngram_rows"],
+        )
+
+    def get_ngram_rows(self, ngram: str) -> Sequence[int]:
+        i = self.ngrams.index_of(ngram)
+        if i < 0:
+            return []
+        return self.ngram_rows[self.ngram_offsets[i]:self.ngram_offsets[i + 1]]
+
+
+def make_ngrams(reading: str) -> set[str]:
+    """all single characters and character pairs of a reading"""
+    return set(reading) | {
+        reading[i:i + 2]
+        for i in range(len(reading) - 1)
+    }
+
+
+def pack_reading_index(table: Sequence[list[str]]) -> dict[str, Section]:
+    """index readings from a table of entry ordinal -> readings"""
+    ordinals = array("i")
+    readings: list[str] = []
+    ngram_rows: dict[str, list[int]] = {}
+    for ordinal, values in enumerate(table):
+        for value in values:
+            row = len(readings)
+            ordinals.append(ordinal)
+            readings.append(value)
+            for ngram in make_ngrams(value):
+                ngram_rows.setdefault(ngram, []).append(row)
+    reading_offsets, reading_data = pack_strings(readings)
+    sorted_rows = array(
+        "i",
+        sorted(range(len(readings)), key=readings.__getitem__),
+    )
+    ngrams = sorted(ngram_rows.keys())
+    ngram_offsets, ngram_data = pack_strings(ngrams)
+    ngram_row_offsets, ngram_row_values = pack_groups(
+        ngram_rows[ngram]
+        for ngram in ngrams
+    )
+    return {
+        "ordinals": ordinals,
+        "reading_offsets": reading_offsets,
+        "readings": reading_data,
+        "sorted_rows": sorted_rows,
+        "ngram_offsets": ngram_offsets,
+        "ngrams": ngram_data,
+        "ngram_row_offsets": ngram_row_offsets,
+        "ngram_rows": ngram_row_values,
+    }
+
+
+def find_prefix_range(
+    index: ReadingIndex,
+    prefix: str,
+    lo: int = 0,
+    hi: int | None = None,
+) -> tuple[int, int]:
+    """range of sorted rows whose readings start with prefix, searched within
+    the sorted rows lo to hi"""
+    if hi is None:
+        hi = len(index.sorted_rows)
+    key = index.readings.__getitem__
+    lo = bisect_left(index.sorted_rows, prefix, lo, hi, key=key)
+    hi = bisect_left(index.sorted_rows, prefix + MAX_CHAR, lo, hi, key=key)
+    return lo, hi
+
+
+def find_substring_candidates(index: ReadingIndex, term: str) -> set[int]:
+    """rows containing every n-gram of term; a superset of the rows that
+    contain term itself"""
+    if len(term) == 1:
+        query_ngrams = [term]
+    else:
+        query_ngrams = [term[i:i + 2] for i in range(len(term) - 1)]
+    postings = [
+        index.get_ngram_rows(ngram)
+        for ngram in query_ngrams
+    ]
+    postings.sort(key=len)
+    candidates = set(postings[0])
+    for posting in postings[1:]:
+        if not candidates:
+            break
+        candidates.intersection_update(posting)
+    return candidates
+
+
+def iter_reading_tiers(index: ReadingIndex, term: str) -> Iterator[list[int]]:
+    """lazily yield rows that equal, start with, and otherwise contain term;
+    each tier is in table order and is only computed once requested"""
+    readings = index.readings
+    sorted_rows = index.sorted_rows
+    i = bisect_left(sorted_rows, term, key=readings.__getitem__)
+    exact_rows = []
+    while i < len(sorted_rows) and readings[sorted_rows[i]] == term:
+        exact_rows.append(sorted_rows[i])
+        i += 1
+    exact_rows.sort()
+    yield exact_rows
+    start_rows = []
+    while i < len(sorted_rows) and readings[sorted_rows[i]].startswith(term):
+        start_rows.append(sorted_rows[i])
+        i += 1
+    start_rows.sort()
+    yield start_rows
+    contain_rows = []
+    for row in find_substring_candidates(index, term):
+        reading = readings[row]
+        if term in reading and not reading.startswith(term):
+            contain_rows.append(row)
+    contain_rows.sort()
+    yield contain_rows
+
+
+def find_readings(
+    index: ReadingIndex,
+    term: str,
+) -> tuple[list[int], list[int], list[int]]:
+    """rows that equal, start with, and otherwise contain term; each list is
+    in table order"""
+    exact_rows, start_rows, contain_rows = iter_reading_tiers(index, term)
+    return exact_rows, start_rows, contain_rows
@@ -0,0 +1,75 @@
+from collections.abc import Iterator
+
+from .reading_index import (
+    ReadingIndex,
+    find_prefix_range,
+    find_substring_candidates,
+)
+from .romaji_to_kana import convert_romaji, iter_romaji_matches
+
+
+def find_romaji_spellings(
+    index: ReadingIndex,
+    romaji: str,
+) -> dict[str, tuple[int, int]]:
+    """kana spellings of romaji that some reading starts with, mapped to the
+    range of sorted rows starting with them. The lattice of all ways to split
+    romaji into kana is walked against the sorted readings, which serve as a
+    trie: each partial spelling narrows the range of its prefix, and
+    spellings that no reading starts with are pruned as soon as they appear"""
+    # partial spellings by romaji index reached
+    frontier: list[dict[str, tuple[int, int]]] = [
+        {}
+        for _ in range(len(romaji) + 1)
+    ]
+    frontier[0][""] = (0, len(index.sorted_rows))
+    for start in range(len(romaji)):
+        for spelling, (lo, hi) in frontier[start].items():
+            for kanas, end in iter_romaji_matches(romaji, start):
+                for kana in kanas:
+                    next_spelling = spelling + kana
+                    if next_spelling in frontier[end]:
+                        continue
+                    next_lo, next_hi = find_prefix_range(
+                        index,
+                        next_spelling,
+                        lo,
+                        hi,
+                    )
+                    if next_lo < next_hi:
+                        frontier[end][next_spelling] = (next_lo, next_hi)
+    return frontier[-1]
+
+
+def iter_romaji_tiers(index: ReadingIndex, romaji: str) -> Iterator[list[int]]:
+    """like iter_reading_tiers, for every kana spelling of romaji at once:
+    lazily yield rows that equal, start with, and otherwise contain a
+    spelling; only the conventional spelling is searched as a substring"""
+    readings = index.readings
+    sorted_rows = index.sorted_rows
+    spellings = find_romaji_spellings(index, romaji)
+    exact_rows = set()
+    for spelling, (lo, hi) in spellings.items():
+        i = lo
+        while i < hi and readings[sorted_rows[i]] == spelling:
+            exact_rows.add(sorted_rows[i])
+            i += 1
+    yield sorted(exact_rows)
+    start_rows = {
+        sorted_rows[i]
+        for lo, hi in spellings.values()
+        for i in range(lo, hi)
+    }
+    start_rows -= exact_rows
+    yield sorted(start_rows)
+    kana = convert_romaji(romaji)
+    contain_rows = []
+    if kana is not None:
+        for row in find_substring_candidates(index, kana):
+            if row in start_rows or row in exact_rows:
+                continue
+            reading = readings[row]
+            if kana in reading and not reading.startswith(kana):
+                contain_rows.append(row)
+    contain_rows.sort()
+    yield contain_rows
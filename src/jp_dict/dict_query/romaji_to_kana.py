@@ -1,3 +1,5 @@
+from collections.abc import Iterator
+
 
 ROMAJI_DICT = {
 
@@ -214,10 +216,76 @@ ROMAJI_DICT = {
 
 }
 
+# other kana that a romaji may stand for, tried only when matching romaji
+# against dictionary readings
+ROMAJI_VARIANTS = {
+    "ji": ["ぢ"],
+    "ja": ["ぢゃ"],
+    "ju": ["ぢゅ"],
+    "jo": ["ぢょ"],
+    "zu": ["づ"],
+    "wa": ["は"],  # particles
+    "e": ["へ"],
+    "o": ["を"],
+}
 
-LONGEST_ROMAJI = max(
-    len(romaji)
-    for romaji in ROMAJI_DICT.keys()
+# vowel pairs whose second vowel may lengthen the first; readings are searched
+# with long vowel marks spelled out, so コーヒー matches kouhii as こおひい
+LONG_VOWELS = {"ou": "お", "ei": "え"}
+
+
+def compile_romaji_trie(
+    romaji_dict: dict[str, str],
+) -> tuple[list[dict[str, int]], list[str | None]]:
+    """compile romaji into a trie of state transitions, with the kana of each
+    state that completes a romaji; state 0 is the root"""
+    transitions: list[dict[str, int]] = [{}]
+    kanas: list[str | None] = [None]
+    for romaji, kana in romaji_dict.items():
+        state = 0
+        for char in romaji:
+            next_state = transitions[state].get(char)
+            if next_state is None:
+                next_state = len(transitions)
+                transitions[state][char] = next_state
+                transitions.append({})
+                kanas.append(None)
+            state = next_state
+        kanas[state] = kana
+    return transitions, kanas
+
+
+def find_romaji_state(
+    transitions: list[dict[str, int]],
+    romaji: str,
+) -> int:
+    state = 0
+    for char in romaji:
+        state = transitions[state][char]
+    return state
+
+
+def compile_romaji_spellings(
+    transitions: list[dict[str, int]],
+    kanas: list[str | None],
+    romaji_variants: dict[str, list[str]],
+) -> list[tuple[str, ...]]:
+    """all kana spellings of each state that completes a romaji"""
+    spellings: list[tuple[str, ...]] = [
+        () if kana is None else (kana,)
+        for kana in kanas
+    ]
+    for romaji, variants in romaji_variants.items():
+        state = find_romaji_state(transitions, romaji)
+        spellings[state] += tuple(variants)
+    return spellings
+
+
+ROMAJI_TRANSITIONS, ROMAJI_KANAS = compile_romaji_trie(ROMAJI_DICT)
+ROMAJI_SPELLINGS = compile_romaji_spellings(
+    ROMAJI_TRANSITIONS,
+    ROMAJI_KANAS,
+    ROMAJI_VARIANTS,
 )
 
 
@@ -225,32 +293,78 @@ class KanaError(ValueError):
     pass
 
 
+def match_romaji(word: str, start: int = 0) -> tuple[str, int] | None:
+    """match the longest romaji at start of word; return its kana and the
+    index after it, or None if no romaji matches"""
+    match = None
+    state = 0
+    for i in range(start, len(word)):
+        state = ROMAJI_TRANSITIONS[state].get(word[i], 0)
+        if not state:
+            break
+        kana = ROMAJI_KANAS[state]
+        if kana is not None:
+            match = kana, i + 1
+    return match
+
+
+def iter_romaji_matches(
+    word: str,
+    start: int,
+) -> Iterator[tuple[tuple[str, ...], int]]:
+    """every romaji at start of word, not just the longest; yield the kana
+    spellings it may stand for and the index after it"""
+    state = 0
+    for i in range(start, len(word)):
+        state = ROMAJI_TRANSITIONS[state].get(word[i], 0)
+        if not state:
+            break
+        spellings = ROMAJI_SPELLINGS[state]
+        if not spellings:
+            continue
+        if i == start and start:
+            long_vowel = LONG_VOWELS.get(word[start - 1:i + 1])
+            if long_vowel is not None:
+                spellings += (long_vowel,)
+        yield spellings, i + 1
+
+
 def pop_romaji(word: str) -> tuple[str, str]:
     """pop a single romaji from the left of word; return the kana representation
     and rest of word"""
-    for romaji_len in range(LONGEST_ROMAJI, 0, -1):
-        try:
-            kana = ROMAJI_DICT[word[:romaji_len]]
-        except KeyError:
-            pass
-        else:
-            return kana, word[romaji_len:]
-    raise KanaError(f"cannot pop kana from {word}")
+    match = match_romaji(word)
+    if match is None:
+        raise KanaError(f"cannot pop kana from {word}")
+    kana, end = match
+    return kana, word[end:]
 
 
-def convert_romaji_to_kana(word: str) -> str:
-    """attempt to convert ascii to kana, raising KanaError on failure.
+def convert_romaji(word: str) -> str | None:
+    """convert ascii to kana in a single pass over the romaji trie; return
+    None if word is not romaji.
 
     `nn` and `n'` will transcribe to `ん`.
     `n` will transcribe to `ん` if no other n-kana matches leading chars.
     """
-    orig_word = word
     word = word.strip()
     kanas = []
-    while word:
-        try:
-            kana, word = pop_romaji(word)
-        except KanaError as error:
-            raise KanaError(f"cannot convert {orig_word} to kana") from error
+    i = 0
+    while i < len(word):
+        match = match_romaji(word, i)
+        if match is None:
+            return None
+        kana, i = match
         kanas.append(kana)
     return "".join(kanas)
+
+
+def convert_romaji_to_kana(word: str) -> str:
+    """attempt to convert ascii to kana, raising KanaError on failure.
+
+    `nn` and `n'` will transcribe to `ん`.
+    `n` will transcribe to `ん` if no other n-kana matches leading chars.
+    """
+    kana = convert_romaji(word)
+    if kana is None:
+        raise KanaError(f"cannot convert {word} to kana")
+    return kana
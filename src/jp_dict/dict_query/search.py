@@ -1,11 +1,37 @@
+import re
+import heapq
 import functools
+from bisect import bisect_left
+from collections import Counter
+from collections.abc import Callable, Iterable, Iterator, Sequence
 
 from .entry import Entry
+from .lazy_entries import LazyEntries
 from .lazy_table import LazyTable
-from .condition_en_words import make_en_terms
-from .romaji_to_kana import KanaError, convert_romaji_to_kana
+from .condition_en_words import (
+    is_en_term,
+    make_en_phrase,
+    make_en_terms,
+    make_en_words,
+    normalize_word,
+    stem_word,
+)
+from .romaji_to_kana import convert_romaji
+from .reading_index import ReadingIndex, iter_reading_tiers
+from .romaji_lattice import iter_romaji_tiers
+from .en_index import EnIndex, rank_entries
+from .query_cache import QueryCache
+from ..stats import get_mapped_size, register_gauge, span
+from .normalize import normalize_reading
 from .tables import (
+    GLOSS_SEPARATOR,
+    UNRANKED,
+    get_generation,
+    pin_generation,
     load_entries,
+    load_entries_map,
+    load_entry_offsets,
+    load_pos_tags,
     load_kana_table,
     load_kanji_table,
     load_rank_table,
@@ -13,46 +39,139 @@ from .tables import (
 )
 
 
-KANA_TABLE = LazyTable(load_kana_table)
-KANJI_TABLE = LazyTable(load_kanji_table)
-RANK_TABLE = LazyTable(load_rank_table)
-EN_TERMS_TABLE = LazyTable(load_en_terms_table)
-
-
-def search_jp(term: str, table: LazyTable) -> dict[int, int]:
-    """search algorithm used in both kana and kanji searches"""
-    exact_matches = []
-    start_matches = []
-    contain_matches = []
-    for entry_id, values in table.contents.items():
-        for value in values:
-            if term == value:
-                exact_matches.append(entry_id)
-            elif value.startswith(term):
-                start_matches.append(entry_id)
-            elif term in value:
-                contain_matches.append(entry_id)
-    exact_matches.sort(key=lambda id: RANK_TABLE.contents[id])
-    start_matches.sort(key=lambda id: RANK_TABLE.contents[id])
-    contain_matches.sort(key=lambda id: RANK_TABLE.contents[id])
-    all_matches = exact_matches + start_matches + contain_matches
-    return {
-        match_id: i
-        for i, match_id in enumerate(all_matches)
+# tables follow the current generation of data files
+KANA_TABLE = LazyTable(load_kana_table, get_generation, "kana table")
+KANJI_TABLE = LazyTable(load_kanji_table, get_generation, "kanji table")
+RANK_TABLE = LazyTable(load_rank_table, get_generation, "rank table")
+EN_TERMS_TABLE = LazyTable(load_en_terms_table, get_generation, "en table")
+ENTRY_OFFSETS_TABLE = LazyTable(
+    load_entry_offsets,
+    get_generation,
+    "entry offsets table",
+)
+ENTRIES_TABLE = LazyTable(load_entries_map, get_generation, "entries file")
+POS_TAGS_TABLE = LazyTable(load_pos_tags, get_generation, "pos tags")
+TABLES = [
+    KANA_TABLE,
+    KANJI_TABLE,
+    RANK_TABLE,
+    EN_TERMS_TABLE,
+    ENTRY_OFFSETS_TABLE,
+    ENTRIES_TABLE,
+    POS_TAGS_TABLE,
+]
+
+TierFunc = Callable[[ReadingIndex, str], Iterator[list[int]]]
+
+# caches are keyed on the generation searched, since a query may finish after
+# a new generation is published and another query validated the caches
+CACHE_SIZE = 256  # queries per cache; set `maxsize` on a cache to change
+TERM_CACHE: QueryCache[dict[int, int]] = QueryCache(CACHE_SIZE)
+RESULT_CACHE: QueryCache[list[int]] = QueryCache(CACHE_SIZE)
+# rank multi-word English queries by BM25 relevance plus entry priority, rather
+# than by number of terms matched
+RELEVANCE_RANKING = True
+
+
+def format_hit_rate(cache: QueryCache) -> str:
+    lookups = cache.hits + cache.misses
+    if not lookups:
+        return "no lookups"
+    return f"{cache.hits / lookups:.0%} of {lookups} lookups"
+
+
+def get_resident_tables() -> str:
+    """tables currently loaded, with the size of their memory maps"""
+    sizes = {
+        table.name: get_mapped_size(contents)
+        for table in TABLES
+        if (contents := table.loaded_contents) is not None
     }
+    total = sum(sizes.values()) / (1 << 20)
+    return f"{total:.1f} MiB in {len(sizes)} of {len(TABLES)} tables"
+
 
+register_gauge("term cache hit rate", lambda: format_hit_rate(TERM_CACHE))
+register_gauge("result cache hit rate", lambda: format_hit_rate(RESULT_CACHE))
+register_gauge("resident tables", get_resident_tables)
 
-def search_kana(term: str) -> dict[int, int]:
-    return search_jp(term, KANA_TABLE)
 
+# search functions below match entry ordinals rather than entry ids; ordinals
+# index directly into the rank and entry offset tables
 
-def search_kanji(term: str) -> dict[int, int]:
-    ids = search_jp(term, KANJI_TABLE)
-    if ids:
-        return ids
+
+@span("rank sort")
+def sort_by_rank(ordinals: Iterable[int], ranks: Sequence[int]) -> list[int]:
+    """stable bucket sort of entry ordinals by rank"""
+    buckets: list[list[int]] = [[] for _ in range(UNRANKED + 1)]
+    for ordinal in ordinals:
+        buckets[ranks[ordinal]].append(ordinal)
+    return [
+        ordinal
+        for bucket in buckets
+        for ordinal in bucket
+    ]
+
+
+def search_jp(
+    term: str,
+    table: LazyTable,
+    limit: int | None = None,
+    find_tiers: TierFunc = iter_reading_tiers,
+) -> dict[int, int]:
+    """search algorithm used in kana, kanji and romaji searches; with a limit,
+    only the best `limit` matches are selected and later tiers are skipped
+    once earlier ones fill the limit"""
+    index: ReadingIndex = table.contents
+    ranks = RANK_TABLE.contents
+    if limit is None:
+        all_matches = [
+            ordinal
+            for rows in find_tiers(index, term)
+            for ordinal in sort_by_rank(
+                (index.ordinals[row] for row in rows),
+                ranks,
+            )
+        ]
+        return {
+            match_id: i
+            for i, match_id in enumerate(all_matches)
+        }
+    matches: dict[int, int] = {}
+    for rows in find_tiers(index, term):
+        if len(matches) >= limit:
+            break
+        tier = [
+            ordinal
+            for ordinal in dict.fromkeys(index.ordinals[row] for row in rows)
+            if ordinal not in matches
+        ]
+        best = heapq.nsmallest(
+            limit - len(matches),
+            tier,
+            key=ranks.__getitem__,
+        )
+        for ordinal in best:
+            matches[ordinal] = len(matches)
+    return matches
+
+
+def search_kana(term: str, limit: int | None = None) -> dict[int, int]:
+    return search_jp(term, KANA_TABLE, limit)
+
+
+def search_romaji(term: str, limit: int | None = None) -> dict[int, int]:
+    """kana search over every plausible kana spelling of romaji term"""
+    return search_jp(term, KANA_TABLE, limit, find_tiers=iter_romaji_tiers)
+
+
+def search_kanji(term: str, limit: int | None = None) -> dict[int, int]:
+    ordinals = search_jp(term, KANJI_TABLE, limit)
+    if ordinals:
+        return ordinals
     else:
         # if no kanji matches, try kana search:
-        return search_kana(term)
+        return search_kana(term, limit)
 
 
 # def search_en(search_str: str) -> dict[int, int]:
@@ -81,71 +200,289 @@ def search_kanji(term: str) -> dict[int, int]:
 #     }
 
 
-def search_en(term: str) -> dict[int, int]:
-    entry_ids = {}
-    for entry_id, entry_terms in EN_TERMS_TABLE.contents.items():
-        try:
-            idx = entry_terms.index(term)
-        except ValueError:
-            continue
-        score = (RANK_TABLE.contents[entry_id], idx / len(entry_terms))
-        entry_ids[entry_id] = score
-    matches = sorted(entry_ids.keys(), key=lambda key: entry_ids[key])
+def search_en(term: str, limit: int | None = None) -> dict[int, int]:
+    """postings are presorted by rank, then by term position; the term is
+    stemmed the same way as indexed glosses"""
+    word = normalize_word(term)
+    if not is_en_term(word):  # too short to be indexed
+        return {}
+    index: EnIndex = EN_TERMS_TABLE.contents
+    postings = index.get_postings(stem_word(word))[:limit]
     return {
-        match_id: i
-        for i, match_id in enumerate(matches)
+        index.posting_ordinals[posting]: i
+        for i, posting in enumerate(postings)
     }
 
 
-def search_ascii(term: str) -> dict[int, int]:
+def search_ascii(term: str, limit: int | None = None) -> dict[int, int]:
     """ascii search as either kana (romaji input) or EN (english input)"""
-    try:
-        kana = convert_romaji_to_kana(term)
-    except KanaError:
-        pass  # search_en outside of exception handling
-    else:
-        return search_kana(kana)
-    return search_en(term)
+    if convert_romaji(term) is not None:
+        return search_romaji(term, limit)
+    return search_en(term, limit)
+
+
+def normalize_term(term: str) -> str:
+    """fold a term the same way as indexed readings"""
+    return normalize_reading(term)
 
 
-def search_single_term(term: str) -> dict[int, int]:
+@span("match term")
+def search_single_term(term: str, limit: int | None = None) -> dict[int, int]:
+    term = normalize_term(term)
+    key = (get_generation(), term, limit)
+    ordinals = TERM_CACHE.get(key)
+    if ordinals is not None:
+        return ordinals
     if term.isascii():
-        entry_ids = search_ascii(term)
+        ordinals = search_ascii(term, limit)
     else:
-        entry_ids = search_kanji(term)
-    return entry_ids
+        ordinals = search_kanji(term, limit)
+    TERM_CACHE.put(key, ordinals)
+    return ordinals
+
+
+def has_phrase(
+    positions: Sequence[Sequence[int]],
+    offsets: Sequence[int] | None = None,
+) -> bool:
+    """whether term i occurs at some position start + offsets[i], for every
+    term i; offsets default to 0, 1, 2..."""
+    if offsets is None:
+        offsets = range(len(positions))
+    starts = {position - offsets[0] for position in positions[0]}
+    for term_positions, offset in zip(positions[1:], offsets[1:]):
+        starts.intersection_update(
+            position - offset
+            for position in term_positions
+        )
+    return bool(starts)
+
 
+def get_phrase_keys(text: str) -> list[tuple[bool, str]]:
+    """words of text as compared in phrases: terms by stem, shorter words as
+    they are"""
+    return [
+        (is_en_term(word), stem_word(word))
+        for word in make_en_words(text)
+    ]
+
+
+def entry_has_phrase(ordinal: int, keys: list[tuple[bool, str]]) -> bool:
+    """whether a gloss of the entry has the words of phrase keys in order"""
+    [entry] = load_entries(
+        [ordinal],
+        ENTRY_OFFSETS_TABLE.contents,
+        ENTRIES_TABLE.contents,
+        POS_TAGS_TABLE.contents,
+    )
+    for _, meaning in entry.meanings:
+        for gloss in meaning.split(GLOSS_SEPARATOR):
+            gloss_keys = get_phrase_keys(gloss)
+            if any(
+                gloss_keys[start:start + len(keys)] == keys
+                for start in range(len(gloss_keys) - len(keys) + 1)
+            ):
+                return True
+    return False
+
+
+def search_short_phrase(text: str, limit: int | None = None) -> list[int]:
+    """entries with a phrase of words too short to be terms, by rank; the
+    entries file is scanned for the words, and entries where they occur are
+    then checked as for other phrases"""
+    pattern = re.compile(
+        rb"(?:'s)?\W+".join(
+            re.escape(word.encode())
+            for word in make_en_words(text)
+        )
+        + rb"(?!\w)"
+    )
+    # scanned in lowercase, since case-insensitive and lookbehind patterns
+    # are slow to scan; matches must start at a word boundary
+    entries_data = ENTRIES_TABLE.contents[:].lower()
+    starts = [
+        match.start()
+        for match in pattern.finditer(entries_data)
+        if not entries_data[match.start() - 1:match.start()].isalnum()
+    ]
+    entry_offsets = ENTRY_OFFSETS_TABLE.contents
+    candidates = [
+        ordinal
+        for ordinal, (offset, length) in enumerate(zip(
+            entry_offsets.offsets,
+            entry_offsets.lengths,
+        ))
+        if (i := bisect_left(starts, offset)) < len(starts)
+        and starts[i] < offset + length
+    ]
+    ranks = RANK_TABLE.contents
+    keys = get_phrase_keys(text)
+    ordinals = []
+    for ordinal in sorted(candidates, key=lambda ordinal: ranks[ordinal]):
+        if entry_has_phrase(ordinal, keys):
+            ordinals.append(ordinal)
+            if len(ordinals) == limit:
+                break
+    return ordinals
+
+
+@span("match phrase")
+def search_phrase(text: str, limit: int | None = None) -> list[int]:
+    """entries with the words of text in order within one gloss, by rank;
+    postings of the rarest stem are checked against the positions of the
+    others, so the cost depends on posting list sizes. Words too short to be
+    terms are only counted in positions, not indexed, so phrases with such
+    words are then checked against the glosses of the matching entries"""
+    phrase = make_en_phrase(text)
+    offsets = [i for i, stem in enumerate(phrase) if stem]
+    if not offsets:
+        return search_short_phrase(text, limit) if phrase else []
+    stems = [phrase[i] for i in offsets]
+    keys = get_phrase_keys(text) if len(stems) < len(phrase) else None
+    index: EnIndex = EN_TERMS_TABLE.contents
+    rarest = min(stems, key=lambda stem: len(index.get_postings(stem)))
+    # ordinal -> posting of each other stem
+    other_postings = {
+        stem: {
+            index.posting_ordinals[posting]: posting
+            for posting in index.get_postings(stem)
+        }
+        for stem in set(stems) - {rarest}
+    }
+    ordinals = []
+    for posting in index.get_postings(rarest):
+        ordinal = index.posting_ordinals[posting]
+        matched_postings = [
+            posting if stem == rarest else other_postings[stem].get(ordinal)
+            for stem in stems
+        ]
+        postings = [
+            matched_posting
+            for matched_posting in matched_postings
+            if matched_posting is not None
+        ]
+        if len(postings) < len(stems):  # a stem is not in the entry
+            continue
+        if not has_phrase(
+            [
+                index.get_phrase_positions(stem_posting)
+                for stem_posting in postings
+            ],
+            offsets,
+        ):
+            continue
+        if keys is not None and not entry_has_phrase(ordinal, keys):
+            continue
+        ordinals.append(ordinal)
+        if len(ordinals) == limit:
+            break
+    return ordinals
 
-def search_dictionary(search_str: str) -> list[Entry]:
+
+def search_terms(terms: list[str], limit: int | None = None) -> list[int]:
     """search from multiple terms individually, order results by num of terms
     matched"""
-    terms = search_str.split()
+    if len(terms) == 1:
+        # dict keys are in insertion order; no need to order ordinals
+        return list(search_single_term(terms[0], limit).keys())
+    # an entry matching several terms may be outside each term's best matches,
+    # so only the final selection can be limited. Match counts and worst
+    # positions are accumulated in a single pass over each distinct term's
+    # matches; repeated terms count once per occurrence
+    match_counts: dict[int, int] = {}
+    worst_positions: dict[int, int] = {}
+    for term, occurrences in Counter(terms).items():
+        for ordinal, position in search_single_term(term).items():
+            match_count = match_counts.get(ordinal)
+            if match_count is None:
+                match_counts[ordinal] = occurrences
+                worst_positions[ordinal] = position
+            else:
+                match_counts[ordinal] = match_count + occurrences
+                if position > worst_positions[ordinal]:
+                    worst_positions[ordinal] = position
+
+    # sort order: by num of search terms matched, then by worst position
+    # among the terms' matches, as before the single-pass merge
+    def get_sort_key(ordinal: int) -> tuple[int, int]:
+        return -match_counts[ordinal], worst_positions[ordinal]
+
+    if limit is None:
+        return sorted(match_counts.keys(), key=get_sort_key)
+    return heapq.nsmallest(limit, match_counts.keys(), key=get_sort_key)
+
+
+@span("rank relevance")
+def search_relevance(stems: list[str], limit: int | None = None) -> list[int]:
+    """entries matching any of the stems, by relevance"""
+    return rank_entries(EN_TERMS_TABLE.contents, stems, limit)
+
+
+def search_query(
+    terms: list[str],
+    quoted: bool = False,
+    limit: int | None = None,
+) -> list[int]:
+    """a quoted query matches an English phrase; other multi-word ascii
+    queries rank entries matching the words as a phrase first, then entries
+    by relevance (with RELEVANCE_RANKING), then entries matching any of the
+    terms"""
+    if not quoted and (len(terms) < 2 or not all(map(str.isascii, terms))):
+        return search_terms(terms, limit)
+    text = " ".join(terms)
+    if quoted:
+        return search_phrase(text, limit)
+    stems = make_en_terms(text)
+    if len(stems) < 2:
+        return search_terms(terms, limit)
+    ranked_ordinals = [search_phrase(text, limit)]
+    if RELEVANCE_RANKING:
+        ranked_ordinals.append(search_relevance(stems, limit))
+    ranked_ordinals.append(search_terms(terms, limit))
+    # entries past the first `limit` of a ranking are past the first `limit`
+    # of the merged ranking
+    ordinals = list(dict.fromkeys(
+        ordinal
+        for ordinals in ranked_ordinals
+        for ordinal in ordinals
+    ))
+    return ordinals if limit is None else ordinals[:limit]
+
+
+def parse_query(search_str: str) -> tuple[list[str], bool]:
+    """normalized terms of a query, and whether it is quoted as a phrase"""
+    search_str = search_str.strip()
+    quoted = len(search_str) > 1 and search_str[0] == search_str[-1] == '"'
+    if quoted:
+        search_str = search_str[1:-1]
+    return [normalize_term(term) for term in search_str.split()], quoted
+
+
+@span("search")
+def search_dictionary(
+    search_str: str,
+    limit: int | None = None,
+) -> Sequence[Entry]:
+    """search for entries matching any of the whitespace-separated terms,
+    returning at most `limit` entries if given; results are cached until a
+    new generation of data files is published, and entries are only loaded
+    once accessed, from the generation that was searched. A query in double
+    quotes only matches entries with its words as an English phrase"""
+    terms, quoted = parse_query(search_str)
     if not terms:
         return []
-    elif len(terms) == 1:
-        # dict keys are in insertion order; no need to order entry_ids
-        entry_ids = search_single_term(search_str).keys()
-        return load_entries(entry_ids)
-    match_dicts = [
-        search_single_term(term)
-        for term in terms
-        if term
-    ]
-    entry_ids = {
-        entry_id
-        for match_dict in match_dicts
-        for entry_id in match_dict.keys()
-    }
-    matches = {}
-    for entry_id in entry_ids:
-        match_ranks = [
-            rank
-            for match_dict in match_dicts
-            if (rank := match_dict.get(entry_id)) is not None
-        ]
-        terms_count = len(terms) - len(match_ranks)
-        best_rank = max(match_ranks)
-        # sort order: by num of search terms matched, then by best rank
-        matches[entry_id] = (terms_count, best_rank)
-    match_ids = sorted(matches.keys(), key=lambda key: matches[key])
-    return load_entries(match_ids)
+    with pin_generation() as generation:
+        TERM_CACHE.validate(generation)
+        RESULT_CACHE.validate(generation)
+        key = (generation, " ".join(terms), quoted, limit)
+        match_ordinals = RESULT_CACHE.get(key)
+        if match_ordinals is None:
+            match_ordinals = search_query(terms, quoted, limit)
+            RESULT_CACHE.put(key, match_ordinals)
+        load_page = functools.partial(
+            load_entries,
+            entry_offsets=ENTRY_OFFSETS_TABLE.contents,
+            entries_map=ENTRIES_TABLE.contents,
+            pos_tags=POS_TAGS_TABLE.contents,
+        )
+    return LazyEntries(match_ordinals, load_page)
@@ -1,26 +1,96 @@
+import os
+import re
 import json
 import gzip
+import mmap
 import shutil
-from typing import Any
+import time
+import hashlib
+from array import array
+from pathlib import Path
+from typing import IO, Any, BinaryIO
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from collections import deque
+from concurrent.futures import Executor, Future, ProcessPoolExecutor
 from importlib import resources
 from xml.etree import ElementTree
 from urllib.request import urlopen
-from collections.abc import Iterable
+from collections.abc import Callable, Iterable, Iterator, Sequence
 from importlib.abc import Traversable
 
-from .entry import Entry
-from .condition_en_words import make_en_terms
+from .entry import UNRANKED, Entry, PosTags, TagIds
+from .condition_en_words import make_en_phrase
+from .normalize import normalize_reading
+from .packed import load_packed, write_packed
+from .reading_index import ReadingIndex, pack_reading_index
+from .en_index import EnIndex, pack_en_index
 from . import data
+from ..stats import span
 
 DICT_DL_URL = "http://ftp.edrdg.org/pub/Nihongo/JMdict_e.gz"
-
-# data files
+CHUNK_SIZE = 1 << 20  # bytes of dictionary XML per indexing task
+GZIP_MAGIC = b"\x1f\x8b"
+# part of every entry hash, so that entries are parsed again when the way they
+# are indexed changes
+INDEX_FORMAT = b"8"
+ENT_SEQ_PATTERN = re.compile(rb"<ent_seq>\s*(\d+)\s*</ent_seq>")
+GLOSS_SEPARATOR = "; "  # between the glosses of a sense
+# entity definitions of the prolog; their values are the part-of-speech tags
+ENTITY_PATTERN = re.compile(rb'<!ENTITY\s+[^\s>]+\s+"([^"]*)"\s*>')
+
+# data files; each update builds a complete generation of them in a staging
+# directory, then publishes it by atomically replacing the current file
 DATA = resources.files(data)
-KANA_TABLE_JSON = DATA / "kana.json"
-KANJI_TABLE_JSON = DATA / "kanji.json"
-RANK_TABLE_JSON = DATA / "ranks.json"
-EN_TERMS_TABLE_JSON = DATA / "en_terms.json"
-ENTRIES_DIR = DATA / "entries"
+GENERATIONS_DIR = DATA / "generations"
+CURRENT_FILE = DATA / "current"  # name of the published generation
+STAGING_SUFFIX = ".staging"
+KANA_TABLE_FILE = "kana.bin"
+KANJI_TABLE_FILE = "kanji.bin"
+RANK_TABLE_FILE = "ranks.bin"
+EN_TERMS_TABLE_FILE = "en_terms.bin"
+ENTRIES_DATA = "entries.jsonl"
+ENTRY_OFFSETS_FILE = "entry_offsets.bin"
+POS_TAGS_FILE = "pos_tags.json"
+# files from older data layouts
+LEGACY_DATA = [
+    DATA / KANA_TABLE_FILE,
+    DATA / KANJI_TABLE_FILE,
+    DATA / RANK_TABLE_FILE,
+    DATA / EN_TERMS_TABLE_FILE,
+    DATA / ENTRIES_DATA,
+    DATA / ENTRY_OFFSETS_FILE,
+    DATA / "entries",
+    DATA / "entry_offsets.json",
+    DATA / "kana.json",
+    DATA / "kanji.json",
+    DATA / "ranks.json",
+    DATA / "en_terms.json",
+]
+
+# generation pinned for the duration of a query, so that every table it reads
+# comes from the same generation even if an update is published meanwhile
+PINNED_GENERATION: ContextVar[str | None] = ContextVar(
+    "PINNED_GENERATION",
+    default=None,
+)
+
+
+# plain, gzipped or downloaded JMdict XML
+DictFile = IO[bytes] | gzip.GzipFile
+
+
+class DictionaryError(ValueError):
+    pass
+
+
+@dataclass(frozen=True)
+class EntryOffsets:
+    """entry ids and record locations in the entries file, by entry ordinal"""
+    ids: Sequence[int]
+    offsets: Sequence[int]
+    lengths: Sequence[int]
 
 
 def get_tag_text(elt: ElementTree.Element, tag: str) -> list[str]:
@@ -37,7 +107,7 @@ def get_rank(elt: ElementTree.Element) -> int:
     rank_tags = get_tag_text(elt, "./k_ele/ke_pri")
     if not rank_tags:
         rank_tags = get_tag_text(elt, "./r_ele/re_pri")
-    ranks = [50]
+    ranks = [UNRANKED]
     for tag in rank_tags:
         if tag.startswith("nf"):
             ranks.append(int(tag.removeprefix("nf")))
@@ -64,24 +134,42 @@ def get_kanas(elt: ElementTree.Element) -> list[str]:
     return get_tag_text(elt, "./r_ele/reb")
 
 
-def get_meanings(elt: ElementTree.Element) -> list[tuple[str, str]]:
+def get_meanings(
+    elt: ElementTree.Element,
+    pos_tags: PosTags,
+) -> list[tuple[TagIds, str]]:
     meanings = []
     for sense in elt.findall("sense"):
-        pos = ", ".join(get_tag_text(sense, "pos"))  # part of speech
-        gloss = "; ".join(get_tag_text(sense, "gloss"))  # glossary
+        pos = pos_tags.encode(get_tag_text(sense, "pos"))  # part of speech
+        gloss = GLOSS_SEPARATOR.join(get_tag_text(sense, "gloss"))  # glossary
         meanings.append((pos, gloss))
     return meanings
 
 
-def make_entry(elt: ElementTree.Element) -> Entry:
+def get_pos_tags(prolog: bytes) -> PosTags:
+    """part-of-speech tags defined as entities in the prolog, in order; a
+    change in entity definitions changes every entry hash, so entry records
+    only refer to the tags of their own prolog"""
+    return PosTags([
+        value.decode()
+        for value in ENTITY_PATTERN.findall(prolog)
+    ])
+
+
+def make_entry_record(
+    elt: ElementTree.Element,
+    pos_tags: PosTags,
+) -> dict[str, Any]:
+    """entry fields of an <entry> element, as stored in the entries file"""
     id_tag = elt.find("ent_seq")
     assert id_tag is not None and id_tag.text
-    id = int(id_tag.text)
-    rank = get_rank(elt)
-    kanjis = get_kanjis(elt)
-    kanas = get_kanas(elt)
-    meanings = get_meanings(elt)
-    return Entry(id, rank, kanjis, kanas, meanings)
+    return {
+        "id": int(id_tag.text),
+        "rank": get_rank(elt),
+        "kanjis": get_kanjis(elt),
+        "kanas": get_kanas(elt),
+        "meanings": get_meanings(elt, pos_tags),
+    }
 
 
 # def get_en_term_freqs(entry: Entry) -> dict[str, int]:
@@ -99,45 +187,456 @@ def make_entry(elt: ElementTree.Element) -> Entry:
 #     return freqs
 
 
-def write_traversable(obj: Any, trav: Traversable) -> None:
-    with resources.as_file(trav) as path:
-        if not path.parent.exists():
-            path.parent.mkdir(parents=True)
-        path.write_text(json.dumps(obj, indent=4, ensure_ascii=False) + "\n")
-
-
-def write_entry(entry: Entry) -> None:
-    entry_file = ENTRIES_DIR / f"{entry.id}.json"
-    write_traversable(entry.__dict__, entry_file)
-
-
-def index_dictionary(dict_xml: bytes) -> None:
-    root = ElementTree.fromstring(dict_xml)
-    kana_table = {}
-    kanji_table = {}
-    rank_table = {}
-    en_terms_table = {}
-    for elt in root.findall("entry"):
-        entry = make_entry(elt)
-        write_entry(entry)
-        kana_table[entry.id] = entry.kanas
-        kanji_table[entry.id] = entry.kanjis
-        rank_table[entry.id] = entry.rank
-        # en_terms_table[entry.id] = get_en_term_freqs(entry)
-        en_terms_table[entry.id] = [
-            term
-            for _, meaning in entry.meanings
-            for term in make_en_terms(meaning)
-        ]
-    write_traversable(kana_table, KANA_TABLE_JSON)
-    write_traversable(kanji_table, KANJI_TABLE_JSON)
-    write_traversable(rank_table, RANK_TABLE_JSON)
-    write_traversable(en_terms_table, EN_TERMS_TABLE_JSON)
-
-
-def update_dictionary() -> None:
-    gzip_bytes = urlopen(DICT_DL_URL).read()
-    index_dictionary(gzip.decompress(gzip_bytes))
+class InlineExecutor(Executor):
+    """run tasks immediately in the calling process"""
+
+    def submit(self, fn: Callable, /, *args: Any, **kwargs: Any) -> Future:
+        future: Future = Future()
+        try:
+            future.set_result(fn(*args, **kwargs))
+        except BaseException as error:
+            future.set_exception(error)
+        return future
+
+
+@dataclass
+class IndexedEntry:
+    """entry fields needed to build the tables, plus its serialized record"""
+    id: int
+    rank: int
+    kanjis: list[str]  # normalized readings
+    kanas: list[str]
+    en_terms: list[list[str]]  # terms of each gloss; "" for short words
+    record: bytes
+    hash: int  # hash of the entry's XML, to detect changes between updates
+    offset: int | None = None  # record offset if already in the entries file
+
+
+def dump_entry_record(entry_record: dict[str, Any]) -> bytes:
+    """serialize an entry record as a single line of JSON"""
+    return json.dumps(
+        entry_record,
+        ensure_ascii=False,
+        separators=(",", ":"),
+    ).encode() + b"\n"
+
+
+def make_indexed_entry(
+    entry_record: dict[str, Any],
+    entry_hash: int,
+    record: bytes | None = None,
+    offset: int | None = None,
+) -> IndexedEntry:
+    en_terms = [
+        make_en_phrase(gloss)
+        for _, meaning in entry_record["meanings"]
+        for gloss in meaning.split(GLOSS_SEPARATOR)
+    ]
+    return IndexedEntry(
+        entry_record["id"],
+        entry_record["rank"],
+        [normalize_reading(kanji) for kanji in entry_record["kanjis"]],
+        [normalize_reading(kana) for kana in entry_record["kanas"]],
+        en_terms,
+        record or dump_entry_record(entry_record),
+        entry_hash,
+        offset,
+    )
+
+
+def read_prolog(dict_file: DictFile) -> tuple[bytes, bytes]:
+    """read the document prolog (declarations and root start tag) of JMdict
+    XML; returns the prolog and the XML read past it. Raises ParseError if
+    there is no JMdict root element"""
+    buffer = b""
+    while block := dict_file.read(CHUNK_SIZE):
+        buffer += block
+        root_start = buffer.find(b"<JMdict")
+        root_end = buffer.find(b">", root_start)
+        if root_start >= 0 and root_end >= 0:
+            return buffer[:root_end + 1], buffer[root_end + 1:]
+    raise ElementTree.ParseError("no <JMdict> root element")
+
+
+def iter_xml_chunks(
+    dict_file: DictFile,
+    prolog: bytes,
+    buffer: bytes = b"",
+) -> Iterator[tuple[bytes, bytes]]:
+    """stream JMdict XML following the prolog in chunks of whole <entry>
+    elements, each paired with the prolog needed to parse it on its own;
+    raises ParseError if the XML does not end with the root end tag, e.g.
+    when a download is cut short"""
+    while True:
+        chunk_end = buffer.rfind(b"</entry>")
+        if chunk_end >= 0:
+            chunk_end += len(b"</entry>")
+            yield prolog, buffer[:chunk_end]
+            buffer = buffer[chunk_end:]
+        block = dict_file.read(CHUNK_SIZE)
+        if not block:
+            break
+        buffer += block
+    if buffer.strip() != b"</JMdict>":
+        raise ElementTree.ParseError("JMdict XML ends before </JMdict>")
+
+
+def split_entries(chunk: bytes) -> list[bytes]:
+    """split a chunk into the raw XML of each <entry> element"""
+    return [
+        piece[piece.find(b"<entry"):] + b"</entry>"
+        for piece in chunk.split(b"</entry>")[:-1]
+    ]
+
+
+def get_entry_id(raw_entry: bytes) -> int | None:
+    match = ENT_SEQ_PATTERN.search(raw_entry)
+    return int(match[1]) if match else None
+
+
+def hash_entry(prolog_key: bytes, raw_entry: bytes) -> int:
+    """64-bit hash of an entry's XML, keyed on the prolog so that a change in
+    entity definitions changes every hash"""
+    digest = hashlib.blake2b(raw_entry, digest_size=8, key=prolog_key).digest()
+    return int.from_bytes(digest, "little", signed=True)
+
+
+# (entry hash, raw entry XML or reused record, reused record offset)
+ChunkItem = tuple[int, bytes, int | None]
+
+
+def index_chunk(prolog: bytes, items: list[ChunkItem]) -> list[IndexedEntry]:
+    """parse new or changed entries as a single document, and rebuild reused
+    entries from their existing records"""
+    raw_entries = [
+        raw_entry
+        for _, raw_entry, offset in items
+        if offset is None
+    ]
+    root = ElementTree.fromstring(
+        prolog + b"".join(raw_entries) + b"</JMdict>"
+    )
+    elts = iter(root.findall("entry"))
+    pos_tags = get_pos_tags(prolog)
+    indexed_entries = []
+    for entry_hash, raw_entry, offset in items:
+        if offset is None:
+            entry_record = make_entry_record(next(elts), pos_tags)
+            indexed_entry = make_indexed_entry(entry_record, entry_hash)
+        else:  # a reused record
+            indexed_entry = make_indexed_entry(
+                json.loads(raw_entry),
+                entry_hash,
+                raw_entry,
+                offset,
+            )
+        indexed_entries.append(indexed_entry)
+    return indexed_entries
+
+
+@dataclass(frozen=True)
+class PreviousIndex:
+    """entries of the current data files, reused by incremental updates"""
+    entry_offsets: EntryOffsets
+    hashes: Sequence[int]
+    ordinals: dict[int, int]  # entry id -> ordinal
+    entries_map: mmap.mmap | bytes
+    generation: str | None = None
+
+    @property
+    def live_size(self) -> int:
+        return sum(self.entry_offsets.lengths)
+
+    def get_record(
+        self,
+        entry_id: int | None,
+        entry_hash: int,
+    ) -> tuple[bytes, int] | None:
+        """record and offset of an entry unchanged since the previous index"""
+        ordinal = self.ordinals.get(entry_id)  # type: ignore[arg-type]
+        if ordinal is None or self.hashes[ordinal] != entry_hash:
+            return None
+        offset = self.entry_offsets.offsets[ordinal]
+        end = offset + self.entry_offsets.lengths[ordinal]
+        return self.entries_map[offset:end], offset
+
+
+def load_previous_index(generation: str | None) -> PreviousIndex | None:
+    try:
+        generation_dir = get_generation_dir(generation)
+        sections = load_packed(generation_dir / ENTRY_OFFSETS_FILE)
+        entries_map = load_entries_map(generation)
+    except (OSError, ValueError):  # missing, empty or outdated data files
+        return None
+    if "hashes" not in sections:
+        return None
+    entry_offsets = EntryOffsets(
+        ids=sections["ids"],
+        offsets=sections["offsets"],
+        lengths=sections["lengths"],
+    )
+    return PreviousIndex(
+        entry_offsets=entry_offsets,
+        hashes=sections["hashes"],
+        ordinals={
+            entry_id: ordinal
+            for ordinal, entry_id in enumerate(entry_offsets.ids)
+        },
+        entries_map=entries_map,
+        generation=generation,
+    )
+
+
+def make_chunk_items(
+    prolog: bytes,
+    chunk: bytes,
+    previous: PreviousIndex | None,
+) -> list[ChunkItem]:
+    prolog_key = hashlib.blake2b(
+        prolog,
+        digest_size=32,
+        person=INDEX_FORMAT,
+    ).digest()
+    items: list[ChunkItem] = []
+    for raw_entry in split_entries(chunk):
+        entry_hash = hash_entry(prolog_key, raw_entry)
+        reused = (
+            previous.get_record(get_entry_id(raw_entry), entry_hash)
+            if previous is not None
+            else None
+        )
+        if reused is None:
+            items.append((entry_hash, raw_entry, None))
+        else:
+            items.append((entry_hash, *reused))
+    return items
+
+
+def iter_indexed_entries(
+    chunks: Iterable[tuple[bytes, bytes]],
+    executor: Executor,
+    jobs: int,
+    previous: PreviousIndex | None = None,
+) -> Iterator[IndexedEntry]:
+    """index XML chunks with the executor, yielding entries in dictionary
+    order; only a few chunks are in flight at once to bound memory. Entries
+    unchanged since the previous index are not parsed again."""
+    pending: deque[Future] = deque()
+    for prolog, chunk in chunks:
+        items = make_chunk_items(prolog, chunk, previous)
+        pending.append(executor.submit(index_chunk, prolog, items))
+        if len(pending) >= 2 * jobs:
+            yield from pending.popleft().result()
+    while pending:
+        yield from pending.popleft().result()
+
+
+def write_reading_index(table: list[list[str]], trav: Traversable) -> None:
+    write_packed(pack_reading_index(table), trav)
+
+
+def write_en_index(
+    en_terms_table: list[list[list[str]]],
+    ranks: array,
+    trav: Traversable,
+) -> None:
+    write_packed(pack_en_index(en_terms_table, ranks), trav)
+
+
+def open_entries_data(
+    generation_path: Path,
+    previous_generation: str | None,
+) -> BinaryIO:
+    """open the entries file of a staged generation; to append, the previous
+    generation's file is copied, so that a failed update leaves the published
+    file as it was"""
+    path = generation_path / ENTRIES_DATA
+    if previous_generation is None:
+        return path.open("wb")
+    with resources.as_file(
+        get_generation_dir(previous_generation) / ENTRIES_DATA
+    ) as previous_path:
+        shutil.copyfile(previous_path, path)
+    return path.open("ab")
+
+
+def write_tables(
+    indexed_entries: Iterable[IndexedEntry],
+    pos_tags: PosTags,
+    executor: Executor,
+    generation_path: Path,
+    previous: PreviousIndex | None = None,
+) -> bool:
+    """write entries, their part-of-speech tags and tables by entry ordinal,
+    i.e. their position in the dictionary, into a generation directory. With
+    a previous index, changed entries are appended to the entries file and
+    unchanged ones keep their records, until more than half of the file is
+    outdated records and it is rewritten. Returns whether anything was added,
+    removed or modified; raises DictionaryError if there are no entries, so
+    that an empty dictionary is never published."""
+    previous_generation = None
+    if previous is not None:
+        outdated_size = len(previous.entries_map) - previous.live_size
+        if outdated_size <= previous.live_size:
+            previous_generation = previous.generation
+    append = previous_generation is not None
+    changed_count = 0
+    ids = array("i")
+    offsets = array("q")
+    lengths = array("I")
+    hashes = array("q")
+    ranks = array("B")
+    kana_table = []
+    kanji_table = []
+    en_terms_table = []
+    entries_file = open_entries_data(generation_path, previous_generation)
+    with entries_file:
+        for indexed_entry in indexed_entries:
+            if append and indexed_entry.offset is not None:
+                offsets.append(indexed_entry.offset)
+                lengths.append(len(indexed_entry.record))
+            else:
+                offsets.append(entries_file.tell())
+                lengths.append(entries_file.write(indexed_entry.record))
+            changed_count += indexed_entry.offset is None
+            ids.append(indexed_entry.id)
+            hashes.append(indexed_entry.hash)
+            ranks.append(indexed_entry.rank)
+            kana_table.append(indexed_entry.kanas)
+            kanji_table.append(indexed_entry.kanjis)
+            en_terms_table.append(indexed_entry.en_terms)
+    if not ids:
+        raise DictionaryError("no entries in the dictionary")
+    if (
+        previous is not None
+        and append
+        and not changed_count
+        and ids == array("i", previous.entry_offsets.ids)
+    ):
+        return False
+    write_packed(
+        {
+            "ids": ids,
+            "offsets": offsets,
+            "lengths": lengths,
+            "hashes": hashes,
+        },
+        generation_path / ENTRY_OFFSETS_FILE,
+    )
+    write_packed({"ranks": ranks}, generation_path / RANK_TABLE_FILE)
+    (generation_path / POS_TAGS_FILE).write_text(
+        json.dumps(pos_tags.tags, ensure_ascii=False),
+        encoding="utf-8",
+    )
+    futures = [
+        executor.submit(
+            write_reading_index,
+            kana_table,
+            generation_path / KANA_TABLE_FILE,
+        ),
+        executor.submit(
+            write_reading_index,
+            kanji_table,
+            generation_path / KANJI_TABLE_FILE,
+        ),
+        executor.submit(
+            write_en_index,
+            en_terms_table,
+            ranks,
+            generation_path / EN_TERMS_TABLE_FILE,
+        ),
+    ]
+    for future in futures:
+        future.result()
+    return True
+
+
+def publish_generation(generation: str) -> None:
+    """atomically make generation the current one"""
+    with resources.as_file(CURRENT_FILE) as path:
+        tmp_path = path.with_name(path.name + ".tmp")
+        tmp_path.write_text(generation)
+        os.replace(tmp_path, path)
+
+
+def remove_old_generations(keep: set[str | None]) -> None:
+    """remove published generations other than those in keep; queries still
+    reading a removed generation keep their memory maps of its files"""
+    with resources.as_file(GENERATIONS_DIR) as generations_path:
+        for path in generations_path.iterdir():
+            if path.name in keep or path.name.endswith(STAGING_SUFFIX):
+                continue
+            shutil.rmtree(path, ignore_errors=True)
+
+
+def index_dictionary(
+    dict_file: DictFile,
+    jobs: int = 1,
+    incremental: bool = True,
+) -> None:
+    """index a JMdict XML file into a new generation of data files and
+    publish it, so that running queries are never exposed to partly written
+    files; with more than one job, XML chunks are parsed and tables are built
+    in a pool of worker processes. An incremental index only parses entries
+    that changed since the previous index."""
+    current = read_current_generation()
+    previous = load_previous_index(current) if incremental else None
+    generation = str(time.time_ns())
+    with resources.as_file(GENERATIONS_DIR) as generations_path:
+        staging_path = generations_path / (generation + STAGING_SUFFIX)
+        staging_path.mkdir(parents=True)
+        try:
+            executor = (
+                ProcessPoolExecutor(jobs)
+                if jobs > 1
+                else InlineExecutor()
+            )
+            with executor:
+                prolog, buffer = read_prolog(dict_file)
+                indexed_entries = iter_indexed_entries(
+                    iter_xml_chunks(dict_file, prolog, buffer),
+                    executor,
+                    jobs,
+                    previous,
+                )
+                changed = write_tables(
+                    indexed_entries,
+                    get_pos_tags(prolog),
+                    executor,
+                    staging_path,
+                    previous,
+                )
+        except BaseException:
+            shutil.rmtree(staging_path, ignore_errors=True)
+            raise
+        if not changed:
+            shutil.rmtree(staging_path, ignore_errors=True)
+            return
+        staging_path.rename(generations_path / generation)
+    publish_generation(generation)
+    # the replaced generation is kept for queries that started before it
+    remove_old_generations({generation, current})
+    for trav in LEGACY_DATA:
+        del_traversable(trav)
+
+
+def open_dict_file(dict_path: Path) -> DictFile:
+    """open a local JMdict file, decompressing it if gzipped"""
+    dict_file = dict_path.open("rb")
+    if dict_file.peek(2)[:2] == GZIP_MAGIC:
+        return gzip.open(dict_file)
+    return dict_file
+
+
+def update_dictionary(jobs: int = 1, dict_path: Path | None = None) -> None:
+    """index the dictionary from a local JMdict file, or download it"""
+    if dict_path is not None:
+        with open_dict_file(dict_path) as dict_file:
+            index_dictionary(dict_file, jobs)
+        return
+    # decompress and index while the download is still in progress
+    with urlopen(DICT_DL_URL) as response, gzip.open(response) as dict_file:
+        index_dictionary(dict_file, jobs)
 
 
 def del_traversable(trav: Traversable) -> None:
@@ -149,43 +648,114 @@ def del_traversable(trav: Traversable) -> None:
 
 
 def clean_dictionary() -> None:
-    del_traversable(KANA_TABLE_JSON)
-    del_traversable(KANJI_TABLE_JSON)
-    del_traversable(RANK_TABLE_JSON)
-    del_traversable(EN_TERMS_TABLE_JSON)
-    del_traversable(ENTRIES_DIR)
+    # looked up on each call, so that redirected data paths are respected
+    for trav in [GENERATIONS_DIR, CURRENT_FILE, *LEGACY_DATA]:
+        del_traversable(trav)
 
 
-def entry_object_hook(json_obj: dict[Any, Any]) -> Entry | dict[Any, Any]:
+def read_current_generation() -> str | None:
     try:
-        return Entry(**json_obj)
-    except TypeError:
-        return json_obj
+        return CURRENT_FILE.read_text().strip() or None
+    except FileNotFoundError:
+        return None
 
 
-def load_entry(entry_id: int) -> Entry:
-    entry_file = ENTRIES_DIR / f"{entry_id}.json"
-    return json.loads(entry_file.read_text(), object_hook=entry_object_hook)
+def get_generation() -> str | None:
+    """the generation pinned by the running query, or else the current one"""
+    generation = PINNED_GENERATION.get()
+    if generation is None:
+        generation = read_current_generation()
+    return generation
 
 
-def load_entries(entry_ids: Iterable[int]) -> list[Entry]:
+@contextmanager
+def pin_generation() -> Iterator[str | None]:
+    """pin the current generation for tables loaded within the context"""
+    token = PINNED_GENERATION.set(read_current_generation())
+    try:
+        yield PINNED_GENERATION.get()
+    finally:
+        PINNED_GENERATION.reset(token)
+
+
+def get_generation_dir(generation: str | None) -> Traversable:
+    if generation is None:
+        raise FileNotFoundError(
+            "no dictionary data found; update the dictionary first"
+        )
+    return GENERATIONS_DIR / generation
+
+
+def load_entry(
+    entries_map: mmap.mmap,
+    offset: int,
+    length: int,
+    pos_tags: PosTags,
+) -> Entry:
+    return Entry.from_record(
+        json.loads(entries_map[offset:offset + length]),
+        pos_tags,
+    )
+
+
+@span("load entries")
+def load_entries(
+    ordinals: Iterable[int],
+    entry_offsets: EntryOffsets,
+    entries_map: mmap.mmap,
+    pos_tags: PosTags,
+) -> list[Entry]:
+    """slice entry records out of the memory-mapped entries file"""
     return [
-        load_entry(id)
-        for id in entry_ids
+        load_entry(
+            entries_map,
+            entry_offsets.offsets[ordinal],
+            entry_offsets.lengths[ordinal],
+            pos_tags,
+        )
+        for ordinal in ordinals
     ]
 
 
-def load_kana_table() -> dict[int, list[str]]:
-    return json.loads(KANA_TABLE_JSON.read_text())
+def load_entries_map(generation: str | None) -> mmap.mmap:
+    trav = get_generation_dir(generation) / ENTRIES_DATA
+    with trav.open("rb") as entries_file:
+        return mmap.mmap(entries_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def load_pos_tags(generation: str | None) -> PosTags:
+    trav = get_generation_dir(generation) / POS_TAGS_FILE
+    return PosTags(json.loads(trav.read_text(encoding="utf-8")))
+
+
+def load_entry_offsets(generation: str | None) -> EntryOffsets:
+    generation_dir = get_generation_dir(generation)
+    sections = load_packed(generation_dir / ENTRY_OFFSETS_FILE)
+    return EntryOffsets(
+        ids=sections["ids"],
+        offsets=sections["offsets"],
+        lengths=sections["lengths"],
+    )
+
+
+def load_kana_table(generation: str | None) -> ReadingIndex:
+    return ReadingIndex.from_sections(
+        load_packed(get_generation_dir(generation) / KANA_TABLE_FILE)
+    )
 
 
-def load_kanji_table() -> dict[int, list[str]]:
-    return json.loads(KANJI_TABLE_JSON.read_text())
+def load_kanji_table(generation: str | None) -> ReadingIndex:
+    return ReadingIndex.from_sections(
+        load_packed(get_generation_dir(generation) / KANJI_TABLE_FILE)
+    )
 
 
-def load_rank_table() -> dict[int, int]:
-    return json.loads(RANK_TABLE_JSON.read_text())
+def load_rank_table(generation: str | None) -> Sequence[int]:
+    generation_dir = get_generation_dir(generation)
+    return load_packed(generation_dir / RANK_TABLE_FILE)["ranks"]
 
 
-def load_en_terms_table() -> dict[int, dict[str, float]]:
-    return json.loads(EN_TERMS_TABLE_JSON.read_text())
+def load_en_terms_table(generation: str | None) -> EnIndex:
+    return EnIndex.from_sections(
+        load_packed(get_generation_dir(generation) / EN_TERMS_TABLE_FILE)
+    )
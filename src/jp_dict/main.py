@@ -4,8 +4,16 @@ from pathlib import Path
 from argparse import ArgumentParser
 from collections.abc import Callable, Sequence
 
-from .ui import print_query, run_repl
-from .dict_query import update_dictionary, search_dictionary, clean_dictionary
+from .stats import format_stats, profile, span
+
+with span("import"):
+    from .ui import print_query, run_repl
+    from .daemon import serve, search_via_daemon
+    from .dict_query import (
+        update_dictionary,
+        search_dictionary,
+        clean_dictionary,
+    )
 
 APP_DESCRIPTION = """
 Search for terms and return a listing of Japanese-to-English dictionary results.
@@ -14,6 +22,17 @@ interactive REPL for searching terms.
 """.strip()
 
 
+def run_with_timings(func: Callable[[], None]) -> None:
+    func()
+    print(format_stats(), file=sys.stderr)
+
+
+def run_profiled(func: Callable[[], None], report_path: Path) -> None:
+    with profile(report_path):
+        func()
+    print(f"Profile written to {report_path}", file=sys.stderr)
+
+
 def parse_args(args: Sequence[str]) -> Callable[[], None]:
     parser = ArgumentParser(
         description=APP_DESCRIPTION,
@@ -23,16 +42,54 @@ def parse_args(args: Sequence[str]) -> Callable[[], None]:
         action="store_true",
         help="update the dictionary data and exit; overrides other arguments",
     )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=1,
+        metavar="N",
+        help="number of worker processes used to index with --update",
+    )
+    parser.add_argument(
+        "--dict-file",
+        type=Path,
+        metavar="PATH",
+        help=(
+            "update from a local JMdict file, plain or gzipped, instead of "
+            "downloading it"
+        ),
+    )
     parser.add_argument(
         "--clean",
         action="store_true",
         help="delete all dictionary files",
     )
+    parser.add_argument(
+        "--serve",
+        action="store_true",
+        help=(
+            "serve queries over a local socket, keeping the dictionary "
+            "loaded; searches from the command line are forwarded to it"
+        ),
+    )
     parser.add_argument(
         "--all",
         action="store_true",
         help="when used with a search term, prints all results to stdout",
     )
+    parser.add_argument(
+        "--timings",
+        action="store_true",
+        help=(
+            "with a search term, search in-process and print per-stage "
+            "timings, table loads and cache hit rates to stderr"
+        ),
+    )
+    parser.add_argument(
+        "--profile",
+        type=Path,
+        metavar="PATH",
+        help="profile calls and memory allocations, writing a report to PATH",
+    )
     parser.add_argument(
         "--hist",
         type=Path,
@@ -44,23 +101,47 @@ def parse_args(args: Sequence[str]) -> Callable[[], None]:
         nargs="*",
     )
     parsed_args = parser.parse_args(args)
+    func: Callable[[], None]
     if parsed_args.update:
-        return update_dictionary
+        func = functools.partial(
+            update_dictionary,
+            jobs=parsed_args.jobs,
+            dict_path=parsed_args.dict_file,
+        )
     elif parsed_args.clean:
-        return clean_dictionary
+        func = clean_dictionary
+    elif parsed_args.serve:
+        func = serve
     elif parsed_args.search_strs:
-        return functools.partial(
+        # a daemon's stages are not timed here, so time an in-process search
+        search_func = (
+            search_dictionary
+            if parsed_args.timings
+            else search_via_daemon
+        )
+        # only the first result is printed without --all
+        query_func = (
+            search_func
+            if parsed_args.all
+            else functools.partial(search_func, limit=1)
+        )
+        func = functools.partial(
             print_query,
             query=" ".join(parsed_args.search_strs),
-            query_func=search_dictionary,
+            query_func=query_func,
             print_all=parsed_args.all,
         )
+        if parsed_args.timings:
+            func = functools.partial(run_with_timings, func)
     else:
-        return functools.partial(
+        func = functools.partial(
             run_repl,
             query_func=search_dictionary,
             history_file=parsed_args.hist,
         )
+    if parsed_args.profile:
+        func = functools.partial(run_profiled, func, parsed_args.profile)
+    return func
 
 
 def main() -> None:
@@ -0,0 +1,211 @@
+import io
+import sys
+import mmap
+import time
+import functools
+import threading
+from array import array
+from pathlib import Path
+from typing import Any
+from collections import Counter
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None  # type: ignore[assignment]
+
+BUCKET_COUNT = 24  # powers of two from 1us, up to about 8s
+PROFILE_LINES = 40  # functions and allocation sites in a profile report
+
+
+class Histogram:
+    """latency histogram with power-of-two microsecond buckets"""
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * BUCKET_COUNT
+
+    def add(self, seconds: float) -> None:
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        bucket = int(seconds * 1_000_000).bit_length()
+        self.buckets[min(bucket, BUCKET_COUNT - 1)] += 1
+
+    def quantile(self, q: float) -> float:
+        """upper bound in seconds of the bucket holding the q quantile"""
+        rank = q * self.count
+        seen = 0
+        for bucket, count in enumerate(self.buckets):
+            seen += count
+            if count and seen >= rank:
+                return min((1 << bucket) / 1_000_000, self.max)
+        return self.max
+
+
+STAGES: dict[str, Histogram] = {}
+COUNTERS: Counter[str] = Counter()
+GAUGES: dict[str, Callable[[], Any]] = {}
+_lock = threading.Lock()
+
+
+def record(stage: str, seconds: float) -> None:
+    with _lock:
+        try:
+            histogram = STAGES[stage]
+        except KeyError:
+            histogram = STAGES[stage] = Histogram()
+        histogram.add(seconds)
+
+
+def count(name: str) -> None:
+    with _lock:
+        COUNTERS[name] += 1
+
+
+def register_gauge(name: str, func: Callable[[], Any]) -> None:
+    """report the value of func in stats, e.g. a cache's hit rate"""
+    GAUGES[name] = func
+
+
+class span:
+    """time a stage of work, as a context manager or decorator"""
+
+    def __init__(self, stage: str) -> None:
+        self.stage = stage
+
+    def __enter__(self) -> None:
+        self._start = time.perf_counter()
+
+    def __exit__(self, *_: Any) -> None:
+        record(self.stage, time.perf_counter() - self._start)
+
+    def __call__(self, func: Callable) -> Callable:
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                record(self.stage, time.perf_counter() - start)
+        return wrapper
+
+
+def reset() -> None:
+    with _lock:
+        STAGES.clear()
+        COUNTERS.clear()
+
+
+def get_mapped_size(obj: Any, seen: set[int] | None = None) -> int:
+    """bytes of the distinct memory maps and arrays that obj refers to, as
+    loaded tables do"""
+    if seen is None:
+        seen = set()
+    if isinstance(obj, memoryview):
+        obj = obj.obj
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+    if isinstance(obj, (mmap.mmap, bytes, bytearray)):
+        return len(obj)
+    if isinstance(obj, array):
+        return len(obj) * obj.itemsize
+    if hasattr(obj, "__dict__"):
+        return sum(
+            get_mapped_size(value, seen)
+            for value in vars(obj).values()
+        )
+    return 0
+
+
+def get_peak_rss() -> int | None:
+    """peak resident set size of this process in bytes"""
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+
+def format_seconds(seconds: float) -> str:
+    if seconds < 0.001:
+        return f"{seconds * 1_000_000:.0f}us"
+    return f"{seconds * 1000:.1f}ms"
+
+
+def format_histogram(histogram: Histogram) -> str:
+    return " ".join(
+        f"<{format_seconds((1 << bucket) / 1_000_000)}:{count}"
+        for bucket, count in enumerate(histogram.buckets)
+        if count
+    )
+
+
+def format_stats() -> str:
+    lines = ["Stage timings:"]
+    with _lock:
+        stages = sorted(STAGES.items())
+        counters = sorted(COUNTERS.items())
+    if not stages:
+        lines.append("    (none)")
+    for stage, histogram in stages:
+        lines.append(
+            f"    {stage}: {histogram.count} calls, "
+            f"total {format_seconds(histogram.total)}, "
+            f"p50 {format_seconds(histogram.quantile(0.5))}, "
+            f"p95 {format_seconds(histogram.quantile(0.95))}, "
+            f"max {format_seconds(histogram.max)}"
+        )
+        lines.append(f"        {format_histogram(histogram)}")
+    if counters:
+        lines.append("Counters:")
+        lines.extend(f"    {name}: {value}" for name, value in counters)
+    if GAUGES:
+        lines.append("Gauges:")
+        lines.extend(
+            f"    {name}: {func()}"
+            for name, func in sorted(GAUGES.items())
+        )
+    peak_rss = get_peak_rss()
+    if peak_rss is not None:
+        lines.append(f"Peak RSS: {peak_rss / (1 << 20):.1f} MiB")
+    return "\n".join(lines)
+
+
+@contextmanager
+def profile(report_path: Path) -> Iterator[None]:
+    """profile calls and memory allocations within the context, writing a
+    report to report_path"""
+    # imported here, since every command imports stats but few profile
+    import pstats
+    import cProfile
+    import tracemalloc
+
+    profiler = cProfile.Profile()
+    tracemalloc.start()
+    profiler.enable()
+    try:
+        yield
+    finally:
+        profiler.disable()
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        report = io.StringIO()
+        report.write("Profile (by cumulative time):\n")
+        profile_stats = pstats.Stats(profiler, stream=report)
+        profile_stats.sort_stats("cumulative").print_stats(PROFILE_LINES)
+        report.write(
+            f"Traced memory: current {current / (1 << 20):.1f} MiB, "
+            f"peak {peak / (1 << 20):.1f} MiB\n"
+            "Top allocation sites:\n"
+        )
+        for stat in snapshot.statistics("lineno")[:PROFILE_LINES]:
+            report.write(f"    {stat}\n")
+        report.write("\n" + format_stats() + "\n")
+        report_path.write_text(report.getvalue())
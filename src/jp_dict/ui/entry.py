@@ -1,6 +1,8 @@
 from typing import Protocol
 from collections.abc import Iterable
 
+from ..stats import span
+
 
 class Entry(Protocol):
 
@@ -21,6 +23,7 @@ class Entry(Protocol):
         ...
 
 
+@span("render")
 def dump_entry(entry: Entry, num: int) -> str:
     sections = []
     kanji_line = (
@@ -38,6 +41,7 @@ def dump_entry(entry: Entry, num: int) -> str:
     return "\n\n".join(sections)
 
 
+@span("render all")
 def dump_all_entries(entries: Iterable[Entry]) -> str:
     sep = "\n\n---\n"
     entry_strs = sep.join(
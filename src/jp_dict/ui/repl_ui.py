@@ -5,6 +5,7 @@ from collections.abc import Callable, Iterable, Sequence
 
 from .entry import Entry, dump_entry, dump_all_entries
 from .print_ui import page_text
+from ..stats import format_stats
 
 PROMPT = "jp> "
 HELP_MESSAGE = r"""
@@ -27,6 +28,9 @@ Available commands:
         make a query with the backup query function; if args are present, make
         the query with those args, otherwise make the query with the previous
         query args
+    stats:
+        print per-stage timings, table loads and unloads, cache hit rates and
+        resident table memory
 """.strip()
 
 QueryFunc = Callable[[str], Sequence[Entry]]
@@ -123,6 +127,8 @@ def run_once(repl: Repl) -> Repl:
         case "", args:
             repl.search_query(args)
             print(repl.dump_cur_result())
+        case "stats", _:
+            print(format_stats())
         case "h" | "help", _:
             print(HELP_MESSAGE)
         case "exit", _:
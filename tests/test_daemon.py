@@ -0,0 +1,84 @@
+import os
+import tempfile
+import threading
+import unittest
+import unittest.mock as mock
+from pathlib import Path
+
+from src.jp_dict.daemon import (
+    DaemonError,
+    QueryHandler,
+    QueryServer,
+    query_daemon,
+    search_via_daemon,
+)
+from src.jp_dict.dict_query.entry import Entry
+
+ENTRY = Entry(
+    id=1524150,
+    rank=20,
+    kanjis=["魔女"],
+    kanas=["まじょ"],
+    meanings=[["noun (common) (futsuumeishi)", "witch"]],
+)
+
+
+class TestDaemon(unittest.TestCase):
+
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.socket_path = Path(self.tmp_dir.name) / "test.sock"
+        self.server = QueryServer(str(self.socket_path), QueryHandler)
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.daemon = True
+        thread.start()
+
+    def tearDown(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+        self.tmp_dir.cleanup()
+
+    @mock.patch("src.jp_dict.daemon.search_dictionary")
+    def test_query(self, mock_search: mock.MagicMock) -> None:
+        mock_search.return_value = [ENTRY]
+        results = query_daemon("majo", limit=1, socket_path=self.socket_path)
+        mock_search.assert_called_with("majo", limit=1)
+        self.assertEqual(results, [ENTRY])
+
+    @mock.patch("src.jp_dict.daemon.search_dictionary")
+    def test_query_error(self, mock_search: mock.MagicMock) -> None:
+        mock_search.side_effect = ValueError("bad query")
+        with self.assertRaises(DaemonError, msg="ValueError: bad query"):
+            query_daemon("majo", socket_path=self.socket_path)
+
+    @mock.patch("src.jp_dict.daemon.search_dictionary")
+    def test_fallback(self, mock_search: mock.MagicMock) -> None:
+        mock_search.return_value = [ENTRY]
+        missing_path = Path(self.tmp_dir.name) / "missing.sock"
+        with mock.patch(
+            "src.jp_dict.daemon.get_socket_path",
+            return_value=missing_path,
+        ):
+            results = search_via_daemon("majo", limit=1)
+        mock_search.assert_called_with("majo", 1)
+        self.assertEqual(results, [ENTRY])
+
+    @mock.patch("src.jp_dict.daemon.search_dictionary")
+    def test_foreign_socket(self, mock_search: mock.MagicMock) -> None:
+        mock_search.return_value = [ENTRY]
+        with (
+            mock.patch(
+                "src.jp_dict.daemon.get_socket_path",
+                return_value=self.socket_path,
+            ),
+            mock.patch("os.getuid", return_value=os.getuid() + 1),
+        ):
+            with self.assertRaises(PermissionError):
+                query_daemon("majo")
+            results = search_via_daemon("majo", limit=1)
+        mock_search.assert_called_once_with("majo", 1)
+        self.assertEqual(results, [ENTRY])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,9 +1,46 @@
+import io
+import json
+import tempfile
+import threading
+import asyncio
 import time
+import dataclasses
 import unittest
 from unittest import mock
+from pathlib import Path
+from xml.etree import ElementTree
+from typing import Any
+from collections.abc import Iterator
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 
-from src.jp_dict.dict_query.search import search_dictionary
-from src.jp_dict.dict_query.lazy_table import LazyTable
+from src.jp_dict.dict_query.search import has_phrase, search_dictionary
+from src.jp_dict.dict_query.async_search import (
+    load_entries_async,
+    search_dictionary_async,
+)
+from src.jp_dict.dict_query.lazy_table import REAPER, LazyTable
+from src.jp_dict.dict_query import search, tables
+from src.jp_dict.dict_query.entry import Entry
+from src.jp_dict.dict_query.lazy_entries import LazyEntries
+from src.jp_dict.dict_query.query_cache import QueryCache
+from src.jp_dict.dict_query.normalize import normalize_reading
+from src.jp_dict.dict_query.romaji_to_kana import convert_romaji
+from src.jp_dict.dict_query.romaji_lattice import iter_romaji_tiers
+from src.jp_dict.dict_query.en_index import (
+    EnIndex,
+    pack_en_index,
+    rank_entries,
+)
+from src.jp_dict.dict_query.condition_en_words import (
+    make_en_phrase,
+    make_en_terms,
+    stem_word,
+)
+from src.jp_dict.dict_query.reading_index import (
+    ReadingIndex,
+    find_readings,
+    pack_reading_index,
+)
 
 # compare first result ID to an iterable of IDs
 # the idea is to ensure the first result is sensible
@@ -21,6 +58,21 @@ class TestEnSearch(unittest.TestCase):
         results = search_dictionary("magical girl")
         self.assertIn(results[0].id, [2209700, 2061000])  # 魔法少女, 魔女っ子
 
+    def test_phrase_query(self) -> None:
+        self.assertEqual(len(search_dictionary('"girl magical"')), 0)
+        results = search_dictionary('"magical girl"')
+        self.assertIn(results[0].id, [2209700, 2061000])
+        self.assertTrue(all(
+            "magical girl" in meaning
+            for result in results
+            for _, meaning in result.meanings
+            if "magical" in meaning
+        ))
+
+    def test_inflected_query(self) -> None:
+        results = search_dictionary("witches")
+        self.assertIn(results[0].id, [1524150])  # 魔女
+
 
 class TestJpSearch(unittest.TestCase):
 
@@ -36,7 +88,6 @@ class TestJpSearch(unittest.TestCase):
         """entries with only a hiragana component, no kanji"""
         pass
 
-    @unittest.skip("will fail; can't currently convert hiragana to katakana")
     def test_romaji_input_katakana_only(self) -> None:
         """entries with only a katakana component, no kanji or hiragana"""
         results = search_dictionary("oorubakku")
@@ -50,35 +101,562 @@ class TestJpSearch(unittest.TestCase):
         results = search_dictionary("まじょ")
         self.assertIn(results[0].id, [1524150])  # 魔女
 
-    @unittest.skip("will fail; no way to convert hiragana to katakana")
     def test_katakana_input(self) -> None:
         results = search_dictionary("オールバック")
         self.assertIn(results[0].id, [1033740])  # オールバック
 
 
+class TestSearchLimit(unittest.TestCase):
+
+    def test_limit_matches_full_results(self) -> None:
+        for query in ["witch", "magical girl", "ma", "魔", "まじょ"]:
+            full_ids = [entry.id for entry in search_dictionary(query)]
+            for limit in [1, 5]:
+                results = search_dictionary(query, limit=limit)
+                self.assertEqual(
+                    [entry.id for entry in results],
+                    full_ids[:limit],
+                )
+
+
+DICT_XML = """<?xml version="1.0" encoding="UTF-8"?>
+<!DOCTYPE JMdict [
+<!ELEMENT JMdict (entry*)>
+<!ENTITY n "noun (common) (futsuumeishi)">
+]>
+<JMdict>
+<entry>
+<ent_seq>1524150</ent_seq>
+<k_ele><keb>魔女</keb><ke_pri>nf36</ke_pri></k_ele>
+<r_ele><reb>まじょ</reb></r_ele>
+<sense><pos>&n;</pos><gloss>witch</gloss></sense>
+</entry>
+<entry>
+<ent_seq>2209700</ent_seq>
+<k_ele><keb>魔法少女</keb></k_ele>
+<r_ele><reb>まほうしょうじょ</reb></r_ele>
+<sense><pos>&n;</pos><gloss>magical girl</gloss></sense>
+</entry>
+</JMdict>
+""".encode()
+
+
+def iter_chunks(dict_xml: bytes) -> Iterator[tuple[bytes, bytes]]:
+    dict_file = io.BytesIO(dict_xml)
+    return tables.iter_xml_chunks(dict_file, *tables.read_prolog(dict_file))
+
+
+def index_xml(
+    dict_xml: bytes,
+    previous: tables.PreviousIndex | None = None,
+) -> list[tables.IndexedEntry]:
+    with tables.InlineExecutor() as executor:
+        return list(tables.iter_indexed_entries(
+            iter_chunks(dict_xml),
+            executor,
+            jobs=1,
+            previous=previous,
+        ))
+
+
+def make_previous_index(
+    indexed_entries: list[tables.IndexedEntry],
+) -> tables.PreviousIndex:
+    records = [entry.record for entry in indexed_entries]
+    lengths = [len(record) for record in records]
+    return tables.PreviousIndex(
+        entry_offsets=tables.EntryOffsets(
+            ids=[entry.id for entry in indexed_entries],
+            offsets=[sum(lengths[:i]) for i in range(len(lengths))],
+            lengths=lengths,
+        ),
+        hashes=[entry.hash for entry in indexed_entries],
+        ordinals={
+            entry.id: ordinal
+            for ordinal, entry in enumerate(indexed_entries)
+        },
+        entries_map=b"".join(records),
+    )
+
+
+def make_dict_xml(glosses: dict[int, str]) -> bytes:
+    """JMdict XML of one entry per gloss, by entry ID"""
+    entries = "".join(
+        f"<entry><ent_seq>{entry_id}</ent_seq><r_ele><reb>か</reb></r_ele>"
+        f"<sense><pos>&n;</pos><gloss>{gloss}</gloss></sense></entry>\n"
+        for entry_id, gloss in glosses.items()
+    )
+    prolog, _ = DICT_XML.split(b"<JMdict>\n")
+    return prolog + f"<JMdict>\n{entries}</JMdict>\n".encode()
+
+
+class IndexedDictTestCase(unittest.TestCase):
+    """searches a dictionary of GLOSSES indexed into a temporary directory"""
+    GLOSSES: dict[int, str] = {}
+
+    def setUp(self) -> None:
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        data_dir = Path(self.tmp_dir.name)
+        patcher = mock.patch.multiple(
+            tables,
+            GENERATIONS_DIR=data_dir / "generations",
+            CURRENT_FILE=data_dir / "current",
+            LEGACY_DATA=[],
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.tmp_dir.cleanup)
+        tables.index_dictionary(io.BytesIO(make_dict_xml(self.GLOSSES)))
+
+    def search_ids(self, query: str) -> list[int]:
+        return [entry.id for entry in search_dictionary(query)]
+
+
+class TestShortWords(IndexedDictTestCase):
+    GLOSSES = {1: "eye", 2: "witch", 3: "ice", 4: "to use"}
+
+    def test_short_word_query(self) -> None:
+        self.assertEqual(self.search_ids("eye"), [1])
+        self.assertEqual(self.search_ids("eyes"), [1])
+        self.assertEqual(self.search_ids("witches"), [2])
+        self.assertEqual(self.search_ids("ice"), [3])
+        # too short to be indexed, even where it is the stem of "use"
+        self.assertEqual(self.search_ids("us"), [])
+
+
+class TestCleanDictionary(IndexedDictTestCase):
+    GLOSSES = {1524150: "witch"}
+
+    def test_clean_redirected_data(self) -> None:
+        with mock.patch.object(tables, "del_traversable") as del_traversable:
+            tables.clean_dictionary()
+        self.assertEqual(
+            [call.args[0] for call in del_traversable.call_args_list],
+            [tables.GENERATIONS_DIR, tables.CURRENT_FILE],
+        )
+
+
+class TestUpdateWhileSearching(IndexedDictTestCase):
+    GLOSSES = {1524150: "witch"}
+
+    def test_results_stay_with_their_generation(self) -> None:
+        search_query = search.search_query
+        calls = []
+
+        def search_query_during_update(*args: Any) -> list[int]:
+            ordinals = search_query(*args)
+            calls.append(args)
+            if len(calls) == 1:
+                # an entry inserted before the witch moves its ordinal
+                tables.index_dictionary(io.BytesIO(make_dict_xml({
+                    1000000: "apple",
+                    1524150: "witch",
+                })))
+                thread = threading.Thread(
+                    target=search_dictionary,
+                    args=("witch",),
+                )
+                thread.start()
+                thread.join()
+            return ordinals
+
+        with mock.patch.object(
+            search,
+            "search_query",
+            search_query_during_update,
+        ):
+            self.assertEqual(self.search_ids("witch"), [1524150])
+        self.assertEqual(len(calls), 2)
+        self.assertEqual(self.search_ids("witch"), [1524150])
+
+
+class TestInvalidDictionary(IndexedDictTestCase):
+    GLOSSES = {1: "witch"}
+
+    def test_invalid_dictionary_is_not_published(self) -> None:
+        dict_xml = make_dict_xml({1: "witch", 2: "hat"})
+        with self.assertRaises(ElementTree.ParseError):  # not JMdict
+            tables.index_dictionary(io.BytesIO(b"<html>502</html>"))
+        with self.assertRaises(ElementTree.ParseError):  # cut short
+            tables.index_dictionary(io.BytesIO(dict_xml[:-20]))
+        with self.assertRaises(tables.DictionaryError):
+            tables.index_dictionary(io.BytesIO(make_dict_xml({})))
+        self.assertEqual(self.search_ids("witch"), [1])
+        self.assertEqual(self.search_ids("hat"), [])
+
+    @mock.patch("src.jp_dict.dict_query.tables.CHUNK_SIZE", new=64)
+    def test_failed_update_keeps_entries_file(self) -> None:
+        entries_path = Path(
+            tables.get_generation_dir(tables.get_generation())
+            / tables.ENTRIES_DATA
+        )
+        size = entries_path.stat().st_size
+        # the changed entry is written before the end of the XML is read
+        dict_xml = make_dict_xml({1: "witch's hat", 2: "hat", 3: "hat"})
+        with self.assertRaises(ElementTree.ParseError):
+            tables.index_dictionary(io.BytesIO(dict_xml[:-20]))
+        self.assertEqual(entries_path.stat().st_size, size)
+
+
+class TestShortWordPhrases(IndexedDictTestCase):
+    GLOSSES = {
+        1: "out of order",
+        2: "out in order",
+        3: "out order",
+        4: "to school",
+        5: "school",
+        6: "(to) be born",
+        7: "to-be; TO BE",
+    }
+
+    def test_phrase_with_short_words(self) -> None:
+        self.assertEqual(self.search_ids('"out of order"'), [1])
+        self.assertEqual(self.search_ids('"out order"'), [3])
+        self.assertEqual(self.search_ids('"to school"'), [4])
+        self.assertEqual(self.search_ids('"school"'), [4, 5])
+        # no term to look up; glosses are searched for the words
+        self.assertEqual(self.search_ids('"to be"'), [6, 7])
+
+
+class TestIndexing(unittest.TestCase):
+
+    @mock.patch("src.jp_dict.dict_query.tables.CHUNK_SIZE", new=64)
+    def test_parallel_matches_serial(self) -> None:
+        serial_entries = index_xml(DICT_XML)
+        self.assertEqual(
+            [entry.id for entry in serial_entries],
+            [1524150, 2209700],
+        )
+        with ProcessPoolExecutor(2) as executor:
+            parallel_entries = list(tables.iter_indexed_entries(
+                iter_chunks(DICT_XML),
+                executor,
+                jobs=2,
+            ))
+        self.assertEqual(parallel_entries, serial_entries)
+
+    def test_incremental_reuses_unchanged_entries(self) -> None:
+        previous = make_previous_index(index_xml(DICT_XML))
+        changed_xml = DICT_XML.replace(b"magical girl", b"magical witch")
+        indexed_entries = index_xml(changed_xml, previous)
+        self.assertEqual(
+            [entry.offset for entry in indexed_entries],
+            [0, None],
+        )
+        self.assertEqual(
+            [
+                dataclasses.replace(entry, offset=None)
+                for entry in indexed_entries
+            ],
+            index_xml(changed_xml),
+        )
+        self.assertEqual(indexed_entries[1].en_terms, [["magic", "witch"]])
+        # entity definitions are part of every entry
+        changed_xml = DICT_XML.replace(b"(common)", b"(general)")
+        indexed_entries = index_xml(changed_xml, previous)
+        self.assertEqual(
+            [entry.offset for entry in indexed_entries],
+            [None, None],
+        )
+
+
+class TestEntry(unittest.TestCase):
+
+    def test_pos_tags(self) -> None:
+        indexed_entries = index_xml(DICT_XML)
+        self.assertNotIn(b"noun", indexed_entries[0].record)
+        pos_tags = tables.get_pos_tags(DICT_XML)
+        entries = [
+            Entry.from_record(json.loads(entry.record), pos_tags)
+            for entry in indexed_entries
+        ]
+        self.assertEqual(
+            entries[0].meanings,
+            [("noun (common) (futsuumeishi)", "witch")],
+        )
+        # loaded entries share part-of-speech strings
+        self.assertIs(entries[0].meanings[0][0], entries[1].meanings[0][0])
+        self.assertFalse(hasattr(entries[0], "__dict__"))
+
+    def test_alt_forms(self) -> None:
+        entry = Entry(1, 50, ["a", "b", "c"], ["x", "y"], [])
+        self.assertEqual(entry.alt_forms, ("b", "y", "c"))
+        entry = Entry(1, 50, ["a"], ["x", "y"], [])
+        self.assertEqual(entry.alt_forms, ("y",))
+        entry = Entry(1, 50, [], ["x"], [])
+        self.assertEqual(entry.alt_forms, ())
+
+
+class TestReadingIndex(unittest.TestCase):
+
+    TABLE = [
+        ["まじょ"],
+        ["まじょっこ", "まじょ"],
+        ["しろまじょ"],
+        ["まほう"],
+    ]
+
+    def test_find_readings(self) -> None:
+        index = ReadingIndex.from_sections(pack_reading_index(self.TABLE))
+        exact, start, contain = find_readings(index, "まじょ")
+        self.assertEqual([index.ordinals[row] for row in exact], [0, 1])
+        self.assertEqual([index.ordinals[row] for row in start], [1])
+        self.assertEqual([index.ordinals[row] for row in contain], [2])
+        exact, start, contain = find_readings(index, "ま")
+        self.assertEqual(exact, [])
+        self.assertEqual(
+            [index.ordinals[row] for row in start],
+            [0, 1, 1, 3],
+        )
+        self.assertEqual([index.ordinals[row] for row in contain], [2])
+        self.assertEqual(find_readings(index, "ぞ"), ([], [], []))
+
+    def test_normalize_reading(self) -> None:
+        self.assertEqual(normalize_reading("オールバック"), "おおるばっく")
+        self.assertEqual(normalize_reading("ｵｰﾙﾊﾞｯｸ"), "おおるばっく")
+        self.assertEqual(normalize_reading("Ｔシャツ"), "tしゃつ")
+        self.assertEqual(normalize_reading("魔女"), "魔女")
+
+
+class TestEnIndex(unittest.TestCase):
+
+    def test_postings_order(self) -> None:
+        en_terms_table = [
+            [["good", "witch"]],
+            [["witch", "hat"], ["witch"]],
+            [["witch"]],
+        ]
+        ranks = [10, 10, 50]
+        en_index = EnIndex.from_sections(pack_en_index(en_terms_table, ranks))
+
+        def get_postings(term: str) -> list[tuple[int, int, int]]:
+            return [
+                (
+                    en_index.posting_ordinals[i],
+                    en_index.posting_positions[i],
+                    en_index.posting_term_counts[i],
+                )
+                for i in en_index.get_postings(term)
+            ]
+
+        # by rank, then by relative position of first occurrence
+        self.assertEqual(
+            get_postings("witch"),
+            [(1, 0, 3), (0, 1, 2), (2, 0, 1)],
+        )
+        self.assertEqual(get_postings("hat"), [(1, 1, 3)])
+        self.assertEqual(get_postings("broom"), [])
+
+    def test_relevance(self) -> None:
+        en_terms_table = [
+            [["the", "cat"]],
+            [["the", "witch"]],
+            [["big", "witch"]],
+            [["the", "witch"]],
+            [["the", "big", "old", "witch"]],
+        ] + [[["the", "dog"]]] * 5
+        ranks = [50, 50, 50, 1] + [50] * 6
+        en_index = EnIndex.from_sections(pack_en_index(en_terms_table, ranks))
+        ordinals = rank_entries(en_index, ["the", "witch"])
+        self.assertEqual(len(ordinals), len(en_terms_table))
+        # priority breaks ties
+        self.assertEqual(ordinals[:2], [3, 1])
+        # a rare term outweighs a common one
+        self.assertLess(ordinals.index(2), ordinals.index(0))
+        # shorter entries rank higher
+        self.assertLess(ordinals.index(1), ordinals.index(4))
+        for limit in range(len(en_terms_table) + 1):
+            self.assertEqual(
+                rank_entries(en_index, ["the", "witch", "big"], limit),
+                rank_entries(en_index, ["the", "witch", "big"])[:limit],
+            )
+
+    def test_phrase_positions(self) -> None:
+        en_terms_table = [[["witch", "hat"], ["hat", "witch", "hat"]]]
+        en_index = EnIndex.from_sections(pack_en_index(en_terms_table, [10]))
+        [posting] = en_index.get_postings("hat")
+        # positions skip one at the gloss boundary
+        self.assertEqual(
+            list(en_index.get_phrase_positions(posting)),
+            [1, 3, 5],
+        )
+        self.assertTrue(has_phrase([[0, 4], [1, 3, 5]]))
+        self.assertFalse(has_phrase([[1, 3, 5], [0]]))
+        # short words are not indexed, but take up a position
+        en_terms_table = [[make_en_phrase("out of order")]]
+        en_index = EnIndex.from_sections(pack_en_index(en_terms_table, [10]))
+        [posting] = en_index.get_postings("order")
+        self.assertEqual(list(en_index.get_phrase_positions(posting)), [2])
+        self.assertTrue(has_phrase([[0], [2]], [0, 2]))
+        self.assertFalse(has_phrase([[0], [1]], [0, 2]))
+
+    def test_stemming(self) -> None:
+        self.assertEqual(stem_word("running"), "run")
+        self.assertEqual(stem_word("Witches,"), "witch")
+        self.assertEqual(stem_word("witches'"), "witch")
+        self.assertEqual(stem_word("witch's"), "witch")
+        self.assertEqual(stem_word("magical"), "magic")
+        self.assertEqual(stem_word("relational"), "relat")
+        self.assertEqual(stem_word("hopping"), stem_word("hop"))
+        self.assertEqual(
+            make_en_terms("(to) run; running; an evening"),
+            ["run", "run", "even"],
+        )
+        # words are kept by their own length, not that of their stem
+        self.assertEqual(make_en_terms("eye"), ["ey"])
+        self.assertEqual(make_en_terms("(to) use"), ["us"])
+        self.assertEqual(make_en_terms("eyes; dying"), ["ey", "dy"])
+
+
+class TestRomajiToKana(unittest.TestCase):
+
+    def test_convert_romaji(self) -> None:
+        self.assertEqual(convert_romaji("majo"), "まじょ")
+        self.assertEqual(convert_romaji("konban"), "こんばん")
+        self.assertEqual(convert_romaji("kon'ya"), "こんや")
+        self.assertEqual(convert_romaji("zasshi"), "ざっし")
+        self.assertIsNone(convert_romaji("witch"))
+
+    def test_romaji_lattice(self) -> None:
+        table = [["こんにちは"], ["かに"], ["かんい"], ["はなぢ"], ["かにかま"]]
+        index = ReadingIndex.from_sections(pack_reading_index(table))
+
+        def get_tiers(romaji: str) -> list[list[int]]:
+            return [
+                [index.ordinals[row] for row in rows]
+                for rows in iter_romaji_tiers(index, romaji)
+            ]
+
+        # particle, n before a vowel, and ji as ぢ
+        self.assertEqual(get_tiers("konnichiwa"), [[0], [], []])
+        self.assertEqual(get_tiers("kani"), [[1, 2], [4], []])
+        self.assertEqual(get_tiers("hanaji"), [[3], [], []])
+        self.assertEqual(get_tiers("kama"), [[], [], [4]])
+
+
+class TestQueryCache(unittest.TestCase):
+
+    def test_lru_eviction(self) -> None:
+        cache: QueryCache[int] = QueryCache(2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        self.assertEqual(cache.get("a"), 1)  # "b" is now least recently used
+        cache.put("c", 3)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), 1)
+        self.assertEqual(cache.get("c"), 3)
+        self.assertEqual((cache.hits, cache.misses), (3, 1))
+
+    def test_validate(self) -> None:
+        cache: QueryCache[int] = QueryCache(2)
+        cache.validate("v1")
+        cache.put("a", 1)
+        cache.validate("v1")
+        self.assertEqual(cache.get("a"), 1)
+        cache.validate("v2")
+        self.assertIsNone(cache.get("a"))
+
+
+class TestLazyEntries(unittest.TestCase):
+
+    def test_paged_loading(self) -> None:
+        load_func = mock.Mock(side_effect=lambda ordinals: list(ordinals))
+        results = LazyEntries(range(10), load_func, page_size=4)
+        self.assertEqual(len(results), 10)
+        load_func.assert_not_called()
+        self.assertEqual(results[0], 0)
+        self.assertEqual(results[3], 3)
+        load_func.assert_called_once_with(range(0, 4))
+        self.assertEqual(results[-1], 9)
+        self.assertEqual(list(results), list(range(10)))
+        self.assertEqual(load_func.call_count, 3)
+        with self.assertRaises(IndexError):
+            results[10]
+
+
 LAZY_TIMEOUT = 3
 
 
+class TestAsyncSearch(unittest.IsolatedAsyncioTestCase):
+
+    async def test_matches_search(self) -> None:
+        results = await search_dictionary_async("witch")
+        self.assertEqual(
+            [entry.id for entry in await load_entries_async(results)],
+            [entry.id for entry in search_dictionary("witch")],
+        )
+
+    async def test_shared_and_cancelled_searches(self) -> None:
+        calls = []
+
+        def search(search_str: str, limit: int | None) -> list[int]:
+            calls.append(search_str)
+            time.sleep(0.1)
+            return [1]
+
+        with mock.patch(
+            "src.jp_dict.dict_query.async_search.search_dictionary",
+            new=search,
+        ):
+            first = asyncio.create_task(search_dictionary_async("Witch"))
+            second = asyncio.create_task(search_dictionary_async("witch"))
+            cancelled = asyncio.create_task(search_dictionary_async("witch"))
+            await asyncio.sleep(0)
+            cancelled.cancel()
+            self.assertEqual(await asyncio.gather(first, second), [[1], [1]])
+        self.assertTrue(cancelled.cancelled())
+        self.assertEqual(calls, ["witch"])
+
+
 class TestLazyTable(unittest.TestCase):
 
     @mock.patch("src.jp_dict.dict_query.lazy_table.TIMEOUT", new=LAZY_TIMEOUT)
     def test_lazy_table(self) -> None:
         lazy_table = LazyTable(lambda: {})
         # contents unloaded
-        self.assertFalse(hasattr(lazy_table, "_contents"))
+        self.assertIsNone(lazy_table.loaded_contents)
         # load contents and return
         self.assertEqual(lazy_table.contents, {})
         # contents loaded
-        self.assertTrue(hasattr(lazy_table, "_contents"))
-        time.sleep(1)
-        # reload contents before timeout
-        lazy_table.contents
-        time.sleep(2)
-        # contents still loaded after first load timeout
-        self.assertTrue(hasattr(lazy_table, "_contents"))
-        time.sleep(LAZY_TIMEOUT - 2)
-        # contents unloaded after last load timeout
-        self.assertFalse(hasattr(lazy_table, "_contents"))
+        self.assertEqual(lazy_table.loaded_contents, {})
+        last_access = lazy_table.last_access
+        REAPER.reap(now=last_access + LAZY_TIMEOUT - 1)
+        # contents still loaded before timeout
+        self.assertEqual(lazy_table.loaded_contents, {})
+        REAPER.reap(now=last_access + LAZY_TIMEOUT)
+        # contents unloaded after timeout
+        self.assertIsNone(lazy_table.loaded_contents)
+
+    def test_reload_on_new_version(self) -> None:
+        versions = ["1"]
+        lazy_table = LazyTable(lambda version: {version}, lambda: versions[-1])
+        self.assertEqual(lazy_table.contents, {"1"})
+        versions.append("2")
+        self.assertEqual(lazy_table.contents, {"2"})
+
+    def test_single_flight_load(self) -> None:
+        loads = []
+
+        def load() -> dict:
+            loads.append(None)
+            time.sleep(0.1)
+            return {}
+
+        lazy_table = LazyTable(load)
+        with ThreadPoolExecutor(4) as executor:
+            for _ in range(4):
+                executor.submit(lambda: lazy_table.contents)
+        self.assertEqual(len(loads), 1)
+
+    @mock.patch("src.jp_dict.dict_query.lazy_table.MEMORY_BUDGET", new=15)
+    def test_memory_budget(self) -> None:
+        first_table = LazyTable(lambda: bytes(10))
+        second_table = LazyTable(lambda: bytes(10))
+        first_table.contents
+        second_table.contents
+        # least recently used table unloaded to fit the budget
+        self.assertIsNone(first_table.loaded_contents)
+        self.assertEqual(second_table.loaded_contents, bytes(10))
 
 
 if __name__ == "__main__":
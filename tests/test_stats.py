@@ -0,0 +1,30 @@
+import unittest
+
+from src.jp_dict import stats
+
+
+class TestStats(unittest.TestCase):
+
+    def setUp(self) -> None:
+        stats.reset()
+
+    def test_histogram(self) -> None:
+        histogram = stats.Histogram()
+        for seconds in [0.00001] * 9 + [0.5]:
+            histogram.add(seconds)
+        self.assertEqual(histogram.count, 10)
+        self.assertLessEqual(histogram.quantile(0.5), 0.000016)
+        self.assertEqual(histogram.quantile(1.0), 0.5)
+
+    def test_span(self) -> None:
+
+        @stats.span("decorated")
+        def func() -> int:
+            return 1
+
+        self.assertEqual(func(), 1)
+        with stats.span("block"):
+            pass
+        self.assertEqual(stats.STAGES["decorated"].count, 1)
+        self.assertEqual(stats.STAGES["block"].count, 1)
+        self.assertIn("decorated: 1 calls", stats.format_stats())
@@ -253,6 +253,13 @@ class TestReplUi(unittest.TestCase):
             with mock.patch("builtins.input", side_effect=["\\exit"]):
                 run_once(self.repl)
 
+    @mock.patch("sys.stdout", new_callable=io.StringIO)
+    def test_stats(self, mock_out: io.StringIO) -> None:
+        with mock.patch("builtins.input", side_effect=["\\stats"]):
+            run_once(self.repl)
+        mock_out.seek(0)
+        self.assertIn("Stage timings:", mock_out.read())
+
 
 class TestReplUiEmptyQuery(unittest.TestCase):
 